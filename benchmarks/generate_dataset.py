@@ -0,0 +1,90 @@
+"""Generate a synthetic tasks.db for benchmarks.
+
+    python benchmarks/generate_dataset.py bench.db --rows 100000
+
+The distributions loosely follow a real to-do list: mostly Low/Medium
+priorities, due dates clustered around today with a long tail (and some
+tasks without one), a few popular categories and many rare ones, and past
+tasks far more likely to be completed than future ones. A fixed seed makes
+every run produce the same database.
+"""
+import argparse
+import os
+import random
+import sys
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # Run from a checkout
+
+from todo.database import TaskDatabase  # noqa: E402
+
+PRIORITY_WEIGHTS = [("Low", 50), ("Medium", 30), ("High", 15), ("", 5)]
+CATEGORIES = ["Work", "Home", "Errands", "Health", "Finance", "Study", "Family", "Garden", "Travel", "Car",
+              "Hobby", "Friends", "Shopping", "Admin", "Reading", "Music", "Sport", "Cooking", "Pets", "Volunteering"]
+VERBS = ["Call", "Email", "Buy", "Fix", "Write", "Review", "Plan", "Book", "Clean", "Read", "Pay", "Prepare",
+         "Schedule", "Update", "Check", "Order", "Organize", "Finish", "Send", "Renew"]
+OBJECTS = ["report", "invoice", "groceries", "dentist", "tickets", "budget", "presentation", "car insurance",
+           "garden hose", "birthday gift", "tax return", "meeting notes", "library books", "passport", "bike",
+           "newsletter", "backup drive", "team lunch", "lease", "slides"]
+WORDS = ["before", "after", "the", "weekend", "urgent", "follow", "up", "with", "ask", "about", "draft",
+         "second", "version", "notes", "from", "call", "remember", "receipt", "online", "office"]
+BATCH_SIZE = 10000
+
+
+def random_rows(count, seed=1, today=None):
+    """Yield add_many tuples for count synthetic tasks."""
+    rng = random.Random(seed)
+    today = today or date.today()
+    priorities = [name for name, _ in PRIORITY_WEIGHTS]
+    priority_weights = [weight for _, weight in PRIORITY_WEIGHTS]
+    # Zipf-like: the first categories are much more common than the last
+    category_weights = [1 / (rank + 1) for rank in range(len(CATEGORIES))]
+    for _ in range(count):
+        title = f"{rng.choice(VERBS)} {rng.choice(OBJECTS)}"
+        description = " ".join(rng.choices(WORDS, k=rng.randint(0, 12)))
+        if rng.random() < 0.1:
+            due_date = ""
+            completed = rng.random() < 0.3
+        else:
+            offset = int(rng.gauss(0, 45))
+            if rng.random() < 0.05:
+                offset = rng.randint(-1500, 1500)  # Long tail of old and far-future tasks
+            due_date = (today + timedelta(days=offset)).isoformat()
+            completed = rng.random() < (0.85 if offset < 0 else 0.1)
+        priority = rng.choices(priorities, priority_weights)[0]
+        category = "" if rng.random() < 0.2 else rng.choices(CATEGORIES, category_weights)[0]
+        yield title, description, due_date, priority, completed, category
+
+
+def generate(db_file, rows, seed=1):
+    """Create db_file with rows synthetic tasks, replacing any existing file."""
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(db_file + suffix):
+            os.remove(db_file + suffix)
+    db = TaskDatabase(db_file)
+    try:
+        batch = []
+        with db.transaction():
+            for row in random_rows(rows, seed):
+                batch.append(row)
+                if len(batch) == BATCH_SIZE:
+                    db.add_many(batch)
+                    batch = []
+            if batch:
+                db.add_many(batch)
+        db.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    finally:
+        db.conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic tasks database.")
+    parser.add_argument("db_file")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    generate(args.db_file, args.rows, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Load test for `python -m todo serve`: requests/sec and latency percentiles.
+
+Start the server first, then e.g.:
+
+    python benchmarks/loadtest_server.py --connections 16 --duration 10 --writes 0.05
+
+Each connection is a keep-alive client looping over a mix of requests:
+paging through /tasks with the keyset cursor, conditional GETs that should
+come back 304, and (with --writes) creating, editing and deleting tasks.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import Counter
+
+
+class Client:
+    """One keep-alive HTTP/1.1 connection."""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def request(self, method, path, payload=None, headers=None):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        body = b"" if payload is None else json.dumps(payload).encode()
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {self.host}", f"Content-Length: {len(body)}"]
+        lines.extend(f"{name}: {value}" for name, value in (headers or {}).items())
+        self.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+        await self.writer.drain()
+        status = int((await self.reader.readline()).split()[1])
+        response_headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            response_headers[name.strip().lower()] = value.strip()
+        length = int(response_headers.get("content-length", 0))
+        data = await self.reader.readexactly(length) if length else b""
+        return status, response_headers, json.loads(data) if data else None
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+async def worker(args, deadline, latencies, statuses):
+    client = Client(args.host, args.port)
+    cursor = None
+    etag = None
+    try:
+        while time.perf_counter() < deadline:
+            roll = random.random()
+            start = time.perf_counter()
+            if roll < args.writes:
+                status, _, task = await client.request("POST", "/tasks", {"title": "load test", "priority": "Low"})
+                if status == 201:
+                    await client.request("PATCH", f"/tasks/{task['id']}", {"completed": True})
+                    status, _, _ = await client.request("DELETE", f"/tasks/{task['id']}")
+            elif roll < args.writes + args.conditional:
+                status, headers, _ = await client.request(
+                    "GET", f"/tasks?limit={args.page_size}", headers={"If-None-Match": etag} if etag else None)
+                etag = headers.get("etag")
+            else:
+                path = f"/tasks?sort={args.sort}&limit={args.page_size}"
+                if cursor:
+                    path += f"&after={cursor}"
+                status, _, page = await client.request("GET", path)
+                cursor = page.get("next") if status == 200 else None
+            latencies.append(time.perf_counter() - start)
+            statuses[status] += 1
+    finally:
+        client.close()
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+async def run(args):
+    latencies = []
+    statuses = Counter()
+    start = time.perf_counter()
+    deadline = start + args.duration
+    await asyncio.gather(*(worker(args, deadline, latencies, statuses) for _ in range(args.connections)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    result = {
+        "requests": len(latencies),
+        "seconds": round(elapsed, 2),
+        "requests_per_second": round(len(latencies) / elapsed, 1),
+        "latency_ms": {name: round(percentile(latencies, fraction) * 1000, 2)
+                       for name, fraction in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99))} if latencies else {},
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+    }
+    print(json.dumps(result, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--connections", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds to run")
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--sort", default="due_date")
+    parser.add_argument("--writes", type=float, default=0.0, help="fraction of create/edit/delete rounds")
+    parser.add_argument("--conditional", type=float, default=0.2, help="fraction of conditional GETs")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
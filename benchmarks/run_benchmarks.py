@@ -0,0 +1,302 @@
+"""Benchmark suite for the task store and the table view.
+
+    python benchmarks/run_benchmarks.py --sizes 10000 100000 --output after.json
+    python benchmarks/run_benchmarks.py --sizes 10000 --compare before.json
+
+Each size gets a synthetic database from generate_dataset.py, generated once
+and kept in --data-dir. Reads are timed against it; writes (import, bulk
+updates and deletes) against a fresh copy per run. The table benchmarks
+drive TaskTableModel and a QTableView on the offscreen Qt platform, and the
+startup benchmarks launch the whole app (startup.py) in a fresh process; both
+are skipped when PyQt5 is not installed. Results are written as JSON, so runs
+from two versions can be compared with --compare.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)  # Run from a checkout
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from generate_dataset import generate  # noqa: E402
+from todo.database import TaskDatabase  # noqa: E402
+from todo.transfer import export_tasks, import_csv  # noqa: E402
+
+DEFAULT_SIZES = [10000, 100000, 1000000]
+PAGE_SIZE = 500
+# Filter sets of the refresh benchmarks, as MainWindow.current_filters would produce them
+REFRESH_FILTERS = {
+    "all": {},
+    "incomplete": {"completed": False},
+    "high_priority": {"priority": "High"},
+    "category": {"category": "Home"},
+    "incomplete_high": {"completed": False, "priority": "High"},
+}
+SEARCHES = ["report", "call notes", "zzz"]  # Common words, two words, no match
+SLOWER_RATIO = 1.2  # --compare flags benchmarks whose median grew by more than this
+STARTUP_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "startup.py")
+STARTUP_TARGET_MS = 500  # From launching the app to its first page of rows on screen
+
+
+def measure(function, repeat, setup=None):
+    """Run function repeat times and return its timings in milliseconds.
+
+    setup(), if given, runs before each call and is not timed.
+    """
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        function()
+        times.append((time.perf_counter() - start) * 1000)
+    return summarize(times)
+
+
+def summarize(times):
+    return {"min_ms": round(min(times), 2), "median_ms": round(statistics.median(times), 2), "runs": len(times)}
+
+
+def dataset(data_dir, rows):
+    """Return the path of the benchmark database with the given number of rows, generating it if needed."""
+    db_file = os.path.join(data_dir, f"tasks-{rows}.db")
+    if os.path.exists(db_file):
+        db = TaskDatabase(db_file)  # Also migrates datasets made by older versions
+        count = db.count_tasks()
+        db.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        db.conn.close()
+        if count == rows:
+            return db_file
+    print(f"generating {rows} rows...", file=sys.stderr)
+    generate(db_file, rows)
+    return db_file
+
+
+def bench_reads(db_file, repeat):
+    db = TaskDatabase(db_file)
+    results = {}
+    try:
+        results["get_all_tasks"] = measure(db.get_all_tasks, repeat)
+        for name, filters in REFRESH_FILTERS.items():
+            # What TaskTableModel.reload runs: the count and the first page
+            def refresh():
+                db.count_tasks(**filters)
+                db.query_tasks(sort="due_date", limit=PAGE_SIZE, **filters)
+            results[f"refresh_{name}"] = measure(refresh, repeat)
+        for sort in ("due_date", "title", "category"):
+            # The last page, reached with a keyset cursor from the end of the list
+            last = db.query_tasks(sort=sort, descending=True, limit=PAGE_SIZE + 1)[-1]
+            position = TaskDatabase.keyset_position(last, sort)
+            results[f"last_page_by_{sort}"] = measure(
+                lambda: db.query_tasks(sort=sort, limit=PAGE_SIZE, after=position), repeat)
+        for keyword in SEARCHES:
+            def search():
+                db.count_tasks(keyword=keyword)
+                db.query_tasks(keyword=keyword, limit=PAGE_SIZE)
+            results[f"search_{keyword.replace(' ', '_')}"] = measure(search, repeat)
+        results["stats"] = measure(db.task_stats, repeat)
+    finally:
+        db.conn.close()
+    return results
+
+
+def bench_transfer(db_file, work_dir, repeat):
+    db = TaskDatabase(db_file)
+    csv_file = os.path.join(work_dir, "export.csv")
+    results = {
+        "export_csv": measure(lambda: export_tasks(db, csv_file), repeat),
+        "export_jsonl": measure(lambda: export_tasks(db, os.path.join(work_dir, "export.jsonl")), repeat),
+    }
+    db.conn.close()
+
+    import_file = os.path.join(work_dir, "import.db")
+
+    def fresh_database():
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(import_file + suffix):
+                os.remove(import_file + suffix)
+        TaskDatabase(import_file).conn.close()
+
+    def run_import():
+        db = TaskDatabase(import_file)
+        import_csv(db, csv_file)
+        db.conn.close()
+
+    results["import_csv"] = measure(run_import, repeat, setup=fresh_database)
+    return results
+
+
+def bench_bulk(db_file, work_dir, repeat):
+    copy = os.path.join(work_dir, "bulk.db")
+    state = {}
+
+    def fresh_copy():
+        if "db" in state:
+            state["db"].conn.close()
+        for suffix in ("-wal", "-shm"):
+            if os.path.exists(copy + suffix):
+                os.remove(copy + suffix)
+        shutil.copyfile(db_file, copy)
+        state["db"] = TaskDatabase(copy)
+
+    results = {
+        "mark_all_completed": measure(lambda: state["db"].set_completed_where(True), repeat, setup=fresh_copy),
+        "clear_completed": measure(lambda: state["db"].delete_where(completed=True), repeat, setup=fresh_copy),
+    }
+    state["db"].conn.close()
+    return results
+
+
+def bench_table(db_file, repeat):
+    """Time TaskTableModel and a QTableView on the offscreen platform; None without PyQt5."""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    try:
+        from PyQt5.QtCore import QEventLoop
+        from PyQt5.QtWidgets import QApplication, QTableView
+    except ImportError:
+        return None
+    import main
+
+    app = QApplication.instance() or QApplication([])
+    executor = main.DatabaseExecutor(db_file)
+    model = main.TaskTableModel(executor)
+    view = QTableView()
+    view.setModel(model)
+    view.resize(900, 600)
+    view.show()
+
+    def wait():
+        while model.loading:
+            app.processEvents(QEventLoop.WaitForMoreEvents)
+        view.repaint()
+
+    def first_page():
+        model.cache.clear()
+        model.set_filters({"completed": False})
+        wait()
+
+    def fetch_10_pages():
+        model.cache.clear()
+        model.set_filters({})
+        wait()
+        while model.canFetchMore() and len(model.tasks) < 10 * PAGE_SIZE:
+            model.fetchMore()
+            wait()
+
+    try:
+        return {
+            "table_first_page": measure(first_page, repeat),
+            "table_fetch_10_pages": measure(fetch_10_pages, repeat),
+        }
+    finally:
+        executor.shutdown()
+        view.close()
+
+
+def bench_startup(db_file, repeat):
+    """Time cold starts of the app, each in a new process, against STARTUP_TARGET_MS; None without PyQt5."""
+    try:
+        import PyQt5  # noqa: F401
+    except ImportError:
+        return None
+    shown = []
+    first_rows = []
+    for _ in range(repeat):
+        start = time.time()  # Wall clock, to compare with the timestamps the other process reports
+        output = subprocess.run([sys.executable, STARTUP_SCRIPT, db_file], capture_output=True, text=True,
+                                check=True).stdout
+        times = json.loads(output.splitlines()[-1])
+        shown.append((times["shown"] - start) * 1000)
+        first_rows.append((times["first_rows"] - start) * 1000)
+    result = summarize(first_rows)
+    result["target_ms"] = STARTUP_TARGET_MS
+    result["within_target"] = result["median_ms"] <= STARTUP_TARGET_MS
+    if not result["within_target"]:
+        print(f"startup took {result['median_ms']} ms, over the {STARTUP_TARGET_MS} ms target", file=sys.stderr)
+    return {"startup_window_shown": summarize(shown), "startup_first_rows": result}
+
+
+def metadata():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+    }
+
+
+def run(sizes, data_dir, repeat):
+    os.makedirs(data_dir, exist_ok=True)
+    results = {}
+    for rows in sizes:
+        db_file = dataset(data_dir, rows)
+        print(f"benchmarking {rows} rows...", file=sys.stderr)
+        size_results = {}
+        with tempfile.TemporaryDirectory() as work_dir:
+            size_results.update(bench_reads(db_file, repeat))
+            size_results.update(bench_transfer(db_file, work_dir, repeat))
+            size_results.update(bench_bulk(db_file, work_dir, repeat))
+        table_results = bench_table(db_file, repeat)
+        if table_results is None:
+            print("PyQt5 is not installed; skipping the table and startup benchmarks", file=sys.stderr)
+        else:
+            size_results.update(table_results)
+            size_results.update(bench_startup(db_file, repeat))
+        results[str(rows)] = size_results
+    return {"meta": metadata(), "results": results}
+
+
+def compare(baseline, current):
+    """Print the median of every benchmark in both runs and flag the slower ones."""
+    print(f"{'rows':>8}  {'benchmark':<26} {'before ms':>10} {'after ms':>10} {'ratio':>6}")
+    for rows, benchmarks in current["results"].items():
+        for name, timing in benchmarks.items():
+            before = baseline["results"].get(rows, {}).get(name)
+            if before is None:
+                continue
+            ratio = timing["median_ms"] / before["median_ms"] if before["median_ms"] else float("inf")
+            flag = "  slower" if ratio > SLOWER_RATIO else ""
+            print(f"{rows:>8}  {name:<26} {before['median_ms']:>10.2f} {timing['median_ms']:>10.2f} "
+                  f"{ratio:>6.2f}{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the task store and the table view.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="dataset sizes in rows")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per benchmark (default: 3)")
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "todo-benchmarks"),
+                        help="where generated datasets are kept between runs")
+    parser.add_argument("--output", help="write the JSON results here instead of stdout")
+    parser.add_argument("--compare", metavar="BASELINE", help="JSON results of an earlier run to compare against")
+    args = parser.parse_args()
+
+    report = run(args.sizes, args.data_dir, args.repeat)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            compare(json.load(file), report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""Cold start of the GUI, timed by run_benchmarks.py in a fresh process per run.
+
+    python benchmarks/startup.py tasks.db
+
+Prints the wall-clock times (time.time()) at which the window was on screen
+and at which its first page of rows was; the caller subtracts the time it
+launched the process, so interpreter start-up and imports count too.
+"""
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # Run from a checkout
+
+
+def probe(db_file):
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5.QtCore import QEventLoop
+    from PyQt5.QtWidgets import QApplication
+    from main import MainWindow
+
+    app = QApplication(sys.argv[:1])
+    window = MainWindow(db_file)
+    window.show()
+    app.processEvents()  # First paint
+    shown = time.time()
+    while window.model.loading:
+        app.processEvents(QEventLoop.WaitForMoreEvents)
+    window.table.repaint()
+    first_rows = time.time()
+    window.close()
+    return {"shown": shown, "first_rows": first_rows, "rows": len(window.model.tasks)}
+
+
+if __name__ == "__main__":
+    print(json.dumps(probe(sys.argv[1])))
@@ -1,88 +1,851 @@
+import os
 import sys
-import sqlite3
-import csv
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+from datetime import date
 from PyQt5.QtWidgets import (
-    QApplication, QMainWindow, QTableWidget, QTableWidgetItem, QPushButton,
+    QApplication, QMainWindow, QTableView, QPushButton,
     QVBoxLayout, QHBoxLayout, QWidget, QLineEdit, QLabel, QDialog, QFormLayout,
-    QDateEdit, QComboBox, QTextEdit, QMessageBox, QHeaderView, QCheckBox, QFileDialog
+    QDateEdit, QComboBox, QTextEdit, QMessageBox, QHeaderView, QCheckBox, QFileDialog, QProgressDialog,
+    QDockWidget, QCompleter, QPlainTextEdit
 )
-from PyQt5.QtCore import Qt, QDate
+from PyQt5.QtCore import (
+    Qt, QDate, QAbstractTableModel, QEvent, QModelIndex, QObject, QStringListModel, QThread, QTimer, pyqtSignal,
+    pyqtSlot
+)
+from PyQt5.QtGui import QFontDatabase
 
+from todo.database import TaskDatabase
+from todo.instrumentation import recorder
+from todo.tasks import PRIORITIES, Task, priority_rank
+from todo.transfer import Cancelled, export_tasks, import_csv
 
 
-class Task:
-    def __init__(self, id, title, description, due_date, priority, completed, category):
-        self.id = id  # Database ID (None if not yet saved)
-        self.title = title
-        self.description = description
-        self.due_date = due_date  # stored as a string "yyyy-MM-dd"
-        self.priority = priority  # "Low", "Medium", or "High"
-        self.completed = completed  # Boolean
-        self.category = category  # Optional category string
 
+# Database access off the GUI thread
 
-# Database Handler  SQLite
-class TaskDatabase:
-    def __init__(self, db_file="tasks.db"):
-        self.conn = sqlite3.connect(db_file)
-        self.create_table()
-
-    def create_table(self):
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS tasks (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT NOT NULL,
-                description TEXT,
-                due_date TEXT,
-                priority TEXT,
-                completed INTEGER,
-                category TEXT
-            )
-        """)
-        self.conn.commit()
+class DatabaseWorker(QObject):
+    """Owns the TaskDatabase connection and runs requests on the executor's thread."""
+    done = pyqtSignal(int, object)  # Request id, result
+    failed = pyqtSignal(int, str)  # Request id, error message
+
+    def __init__(self, executor, db_file):
+        super(DatabaseWorker, self).__init__()
+        self.executor = executor
+        self.db_file = db_file
+        self.db = None
+
+    @pyqtSlot()
+    def open(self):
+        self.db = TaskDatabase(self.db_file)
+
+    @pyqtSlot(int, object)
+    def run_request(self, request_id, function):
+        if function is None:
+            # Shutdown request, queued behind everything submitted before it
+            self.db.conn.close()
+            QThread.currentThread().quit()
+            return
+        if self.executor.is_stale(request_id):
+            return  # A newer request with the same key replaced it while it was queued
+        profiling = recorder.profiling  # See InteractionProfiler
+        if profiling:
+            recorder.profile_thread()
+        start = time.perf_counter()
+        try:
+            result = function(self.db)
+        except Exception as e:
+            self.db.conn.rollback()
+            self.failed.emit(request_id, str(e))
+            return
+        finally:
+            if profiling:
+                recorder.stop_profile_thread()
+        recorder.record_since("executor.run", start)
+        self.done.emit(request_id, result)
+
+
+class DatabaseExecutor(QObject):
+    """Runs TaskDatabase calls on a dedicated thread so the GUI never waits on SQLite.
+
+    Requests are functions taking the worker's TaskDatabase. They run one at a
+    time in submission order, and their results are handed to the callback back
+    on the GUI thread. A query submitted with a key supersedes any earlier query
+    with the same key: if that one has not started yet it is skipped, and its
+    result is dropped either way.
+    """
+    submit = pyqtSignal(int, object)
+    error = pyqtSignal(str)  # Emitted for failed requests that have no errback
+
+    def __init__(self, db_file="tasks.db", parent=None):
+        super(DatabaseExecutor, self).__init__(parent)
+        self.db_file = db_file
+        self.next_id = 0
+        self.callbacks = {}  # Request id -> (callback, errback) for every live request
+        self.latest = {}  # Key -> id of the newest query with that key
+        self.submitted = {}  # Request id -> perf_counter() at submission, while recording timings
+
+        self.thread = QThread()
+        self.worker = DatabaseWorker(self, db_file)
+        self.worker.moveToThread(self.thread)
+        self.thread.started.connect(self.worker.open)
+        self.submit.connect(self.worker.run_request)
+        self.worker.done.connect(self.request_done)
+        self.worker.failed.connect(self.request_failed)
+        self.thread.start()
+
+    def is_stale(self, request_id):
+        """Return True if the request was superseded or cancelled (safe to call from any thread)."""
+        return request_id not in self.callbacks
+
+    def query_async(self, function, callback=None, errback=None, key=None):
+        """Queue a read. Returns the request id."""
+        self.next_id += 1
+        request_id = self.next_id
+        if key is not None:
+            self.cancel(key)
+            self.latest[key] = request_id
+        self.callbacks[request_id] = (callback, errback)
+        if recorder.enabled:
+            self.submitted[request_id] = time.perf_counter()
+        self.submit.emit(request_id, function)
+        return request_id
+
+    def mutate_async(self, function, callback=None, errback=None):
+        """Queue a write. Writes are never superseded. Returns the request id."""
+        return self.query_async(function, callback, errback)
+
+    def cancel(self, key):
+        """Drop the newest query submitted with the given key, if it is still pending."""
+        request_id = self.latest.pop(key, None)
+        self.callbacks.pop(request_id, None)
+        self.submitted.pop(request_id, None)
+
+    def request_done(self, request_id, result):
+        callback, _ = self.callbacks.pop(request_id, (None, None))
+        start = self.submitted.pop(request_id, None)
+        if callback is not None:
+            callback(result)
+        if start is not None:
+            recorder.record_since("executor.round_trip", start)  # Queueing, the query and the callback
+
+    def request_failed(self, request_id, message):
+        self.submitted.pop(request_id, None)
+        if request_id not in self.callbacks:
+            return  # Superseded; nobody is waiting for it
+        _, errback = self.callbacks.pop(request_id)
+        if errback is not None:
+            errback(message)
+        else:
+            self.error.emit(message)
+
+    def shutdown(self):
+        """Finish the queued requests, close the connection and stop the thread."""
+        self.submit.emit(0, None)
+        self.thread.wait()
+
+
+# Table model: loads rows lazily, one page at a time
+
+class TaskTableModel(QAbstractTableModel):
+    changed = pyqtSignal()  # Tasks were written, by this window or another connection
+
+    HEADERS = ["ID", "Title", "Due Date", "Priority", "Category", "Completed"]
+    PAGE_SIZE = 500
+    CACHE_SIZE = 32  # Number of recent queries whose first page is kept
+    MAX_CHANGES = 200  # More changes than this since the last poll are cheaper to reload
+
+    def __init__(self, executor, parent=None):
+        super(TaskTableModel, self).__init__(parent)
+        self.executor = executor
+        self.filters = {}
+        self.sort_column = None  # None: by relevance for keyword searches, else by id (no header clicked)
+        self.descending = False
+        self.tasks = []  # The rows fetched so far
+        self.total = 0  # Number of rows matching the filters
+        self.generation = 0  # Bumped on every reload, so late results can be recognised
+        self.loading = False  # A reload or page fetch is in flight
+        self.version = None  # Change log version the rows are current with
+        self.seen_data_version = None  # PRAGMA data_version at the last poll_changes
+        self.reload_started = None  # perf_counter() of the last reload/fetchMore, for the timings
+        self.fetch_started = None
+        # (filters, sort) -> (change version, total, first page), least recently used first
+        self.cache = OrderedDict()
+
+    def set_filters(self, filters):
+        """Apply new search/filter criteria and start fetching from the first page."""
+        self.filters = filters
+        self.reload()
+
+    @property
+    def ranked(self):
+        """True while rows are in search relevance order, which has no keyset cursor."""
+        return self.sort_column is None and bool(self.filters.get("keyword"))
+
+    def page_query(self, after=None):
+        """Return a function fetching the page that follows the task after (the first page if None).
+
+        Pages continue from the (sort value, id) of the last row rather than an
+        OFFSET, so a page deep into the list costs the same index seek as the first.
+        Relevance-ranked searches are the exception and page by offset.
+        """
+        filters = dict(self.filters, sort=self.sort_column, descending=self.descending)
+        if self.ranked:
+            offset = 0 if after is None else len(self.tasks)
+            return lambda db: db.query_tasks(limit=self.PAGE_SIZE, offset=offset, **filters)
+        position = None if after is None else TaskDatabase.keyset_position(after, self.sort_column)
+        return lambda db: db.query_tasks(limit=self.PAGE_SIZE, after=position, **filters)
+
+    def reload(self):
+        """Re-run the query in the background and show its first page when it arrives.
+
+        If the same query ran recently its cached first page is shown at once, and
+        the background request only checks that the change log has not moved on.
+        """
+        self.generation += 1
+        self.loading = True
+        self.reload_started = time.perf_counter()
+        filters = self.filters
+        first_page = self.page_query()
+        key = (tuple(sorted(filters.items())), self.sort_column, self.descending)
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.cache.move_to_end(key)
+            with recorder.timed("model.reload.cached_apply"):
+                self.beginResetModel()
+                _, self.total, tasks = cached
+                self.tasks = list(tasks)
+                self.endResetModel()
+        cached_version = cached[0] if cached is not None else None
+
+        def load(db):
+            # Read before the rows: a write in between is then replayed by poll_changes
+            version = db.change_version()
+            if version == cached_version:
+                return version, None
+            return version, (db.count_tasks(**filters), first_page(db))
+
+        self.executor.query_async(load, lambda result: self.reloaded(key, result), key="tasks")
+
+    def reloaded(self, key, result):
+        version, data = result
+        if self.version is not None and version != self.version:
+            self.changed.emit()
+        self.version = version
+        if data is not None:
+            with recorder.timed("model.reload.apply"):
+                self.beginResetModel()
+                self.total, self.tasks = data
+                self.endResetModel()
+            self.cache[key] = (version, self.total, list(self.tasks))
+            if len(self.cache) > self.CACHE_SIZE:
+                self.cache.popitem(last=False)
+        self.loading = False
+        recorder.record_since("model.reload", self.reload_started)  # From the request to rows on screen
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.tasks)
+
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.HEADERS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+        task = self.tasks[index.row()]
+        column = index.column()
+        if column == 0:
+            return str(task.id)
+        if column == 1:
+            return task.title
+        if column == 2:
+            return task.due_date
+        if column == 3:
+            return task.priority
+        if column == 4:
+            return task.category
+        return "Yes" if task.completed else "No"
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        # Answered here rather than by the base class: the vertical header asks for every row it lays out
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return section + 1
+
+    def canFetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self.loading:
+            return False
+        return len(self.tasks) < self.total
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self.loading:
+            return
+        self.loading = True
+        self.fetch_started = time.perf_counter()
+        generation = self.generation
+        self.executor.query_async(self.page_query(self.tasks[-1] if self.tasks else None),
+                                  lambda page: self.page_fetched(generation, page), key="tasks")
+
+    def page_fetched(self, generation, page):
+        if generation != self.generation:
+            return
+        self.loading = False
+        if not page:
+            # Rows were deleted behind our back; stop asking for more
+            self.total = len(self.tasks)
+            return
+        with recorder.timed("model.fetch_more.apply"):
+            self.beginInsertRows(QModelIndex(), len(self.tasks), len(self.tasks) + len(page) - 1)
+            self.tasks.extend(page)
+            self.endInsertRows()
+        recorder.record_since("model.fetch_more", self.fetch_started)
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        """Sort by a header column; the ordering itself is done by SQLite.
+
+        A column of -1 (no sort indicator) restores the default order.
+        """
+        sort_column = TaskDatabase.SORT_COLUMNS[column] if column >= 0 else None
+        descending = order == Qt.DescendingOrder and sort_column is not None
+        if (sort_column, descending) == (self.sort_column, self.descending):
+            return  # E.g. QTableView.setSortingEnabled re-applying the current order
+        self.sort_column = sort_column
+        self.descending = descending
+        self.reload()
+
+    def task_at(self, row):
+        """Return the Task shown in the given row."""
+        return self.tasks[row]
+
+    def row_of(self, task_id):
+        """Return the row of a fetched task, or None if it is not loaded."""
+        for row, task in enumerate(self.tasks):
+            if task.id == task_id:
+                return row
+        return None
+
+    def mutate(self, function, apply):
+        """Run a write in the background, then apply its result to the rows.
+
+        function(db, filters) runs on the database thread; apply(result) runs on
+        the GUI thread. Requests run in order, so a reload submitted after the
+        write already shows it and apply is skipped.
+        """
+        generation = self.generation
+        filters = self.filters
+        self.cache.clear()  # The cached pages share Task objects with the rows being changed
+
+        def applied(result):
+            if generation == self.generation:
+                with recorder.timed("model.mutate.apply"):
+                    apply(result)
+            self.changed.emit()
+
+        self.executor.mutate_async(lambda db: function(db, filters), applied)
 
     def add_task(self, task):
-        cursor = self.conn.cursor()
-        cursor.execute(
-            "INSERT INTO tasks (title, description, due_date, priority, completed, category) VALUES (?, ?, ?, ?, ?, ?)",
-            (task.title, task.description, task.due_date, task.priority, 1 if task.completed else 0, task.category)
-        )
-        self.conn.commit()
-        task.id = cursor.lastrowid
-        return task.id
-
-    def update_task(self, task):
-        cursor = self.conn.cursor()
-        cursor.execute(
-            "UPDATE tasks SET title=?, description=?, due_date=?, priority=?, completed=?, category=? WHERE id=?",
-            (task.title, task.description, task.due_date, task.priority, 1 if task.completed else 0, task.category,
-             task.id)
-        )
-        self.conn.commit()
+        """Save a new task and insert its row."""
+        def add(db, filters):
+            db.add_task(task)
+            return db.count_tasks(ids=[task.id], **filters) > 0
+        self.mutate(add, lambda matches: self.insert_task(task, matches))
+
+    def save_task(self, task):
+        """Save an edited task and update its row."""
+        def save(db, filters):
+            db.update_task(task)
+            return db.count_tasks(ids=[task.id], **filters) > 0
+        self.mutate(save, lambda matches: self.update_task(task, matches))
 
     def delete_task(self, task_id):
-        cursor = self.conn.cursor()
-        cursor.execute("DELETE FROM tasks WHERE id=?", (task_id,))
-        self.conn.commit()
+        """Delete a task and remove its row."""
+        def delete(db, filters):
+            db.delete_task(task_id)
+        self.mutate(delete, lambda _: self.remove_task(task_id))
+
+    def poll_changes(self):
+        """Apply the writes made since the rows were loaded, by this or any other connection.
+
+        A PRAGMA data_version check skips the change log while nothing was
+        written; otherwise only the tasks in the log are re-read, and the rows
+        are reloaded if too many changed.
+        """
+        if self.loading or self.version is None:
+            return
+        filters = self.filters
+        since = self.version
+        seen = self.seen_data_version
+        generation = self.generation
+
+        def poll(db):
+            data_version = db.data_version()
+            if data_version == seen:
+                return data_version, None
+            changes = db.changes_since(since, limit=self.MAX_CHANGES)
+            if changes is None:
+                return data_version, (None, None, None, None)
+            version, changed = changes
+            if not changed:
+                return data_version, (version, [], [], None)
+            ids = [task_id for task_id, op in changed if op != "delete"]
+            matching = db.query_tasks(ids=ids, **filters) if ids else []
+            return data_version, (version, changed, matching, db.count_tasks(**filters))
+
+        self.executor.query_async(poll, lambda result: self.changes_polled(generation, result), key="changes")
+
+    def changes_polled(self, generation, result):
+        if generation != self.generation:
+            return  # A reload is on its way with newer rows
+        self.seen_data_version, changes = result
+        if changes is None:
+            return
+        version, changed, matching, total = changes
+        if version is None:
+            self.reload()
+            self.changed.emit()
+            return
+        self.version = version
+        if not changed:
+            return
+        self.cache.clear()
+        with recorder.timed("model.poll.apply"):
+            matching = {task.id: task for task in matching}
+            loaded = {task.id for task in self.tasks}
+            for task_id, op in changed:
+                task = matching.get(task_id)
+                if task is not None:
+                    self.update_task(task, True)
+                elif task_id in loaded:
+                    self.remove_task(task_id)
+        self.total = total
+        self.changed.emit()
+
+    def set_total(self, total):
+        self.total = total
+
+    def _sort_key(self, task):
+        value = getattr(task, self.sort_column or "id")
+        if self.sort_column == "priority":
+            value = priority_rank(value)
+        # SQLite orders NULLs first
+        return (value is not None, value, task.id)
+
+    def _insert_position(self, task):
+        """Binary-search the fetched rows for where the task belongs in sort order."""
+        key = self._sort_key(task)
+        low, high = 0, len(self.tasks)
+        while low < high:
+            middle = (low + high) // 2
+            other = self._sort_key(self.tasks[middle])
+            before = other > key if self.descending else other < key
+            if before:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def insert_task(self, task, matches):
+        """Show a newly saved task without reloading the other rows.
+
+        matches says whether the task satisfies the current filters.
+        """
+        if not matches:
+            return
+        # Relevance is not known here; a new match goes after the fetched rows
+        position = len(self.tasks) if self.ranked else self._insert_position(task)
+        # Not canFetchMore(): that is also False while a page is in flight
+        beyond_fetched = position == len(self.tasks) and len(self.tasks) < self.total
+        self.total += 1
+        if beyond_fetched:
+            return  # Belongs to a page that has not been fetched yet
+        self.beginInsertRows(QModelIndex(), position, position)
+        self.tasks.insert(position, task)
+        self.endInsertRows()
+
+    def update_task(self, task, matches):
+        """Refresh, move or drop the row of a task whose fields changed."""
+        row = self.row_of(task.id)
+        if row is None:
+            self.insert_task(task, matches)
+            return
+        if not matches:
+            self.remove_task(task.id)
+            return
+        if self.ranked:
+            # Keeps its place; relevance is not known here
+            self.tasks[row] = task
+            self.dataChanged.emit(self.index(row, 0), self.index(row, self.columnCount() - 1))
+            return
+        # Take the row out to find where it belongs if its sort value changed
+        del self.tasks[row]
+        position = self._insert_position(task)
+        beyond_fetched = position == len(self.tasks) and len(self.tasks) + 1 < self.total
+        self.tasks.insert(row, task)
+        if beyond_fetched:
+            # Sorted past the fetched rows; a later page will bring it back
+            self.beginRemoveRows(QModelIndex(), row, row)
+            del self.tasks[row]
+            self.endRemoveRows()
+            return
+        if position != row:
+            # beginMoveRows counts the destination before the row is taken out
+            destination = position + 1 if position > row else position
+            self.beginMoveRows(QModelIndex(), row, row, QModelIndex(), destination)
+            self.tasks.insert(position, self.tasks.pop(row))
+            self.endMoveRows()
+            row = position
+        self.dataChanged.emit(self.index(row, 0), self.index(row, self.columnCount() - 1))
+
+    def remove_task(self, task_id):
+        """Remove a deleted task's row without reloading the others."""
+        row = self.row_of(task_id)
+        if row is None:
+            # Not fetched yet, so we cannot tell whether it was counted
+            filters = self.filters
+            self.executor.query_async(lambda db: db.count_tasks(**filters), self.set_total, key="total")
+            return
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self.tasks[row]
+        self.total -= 1
+        self.endRemoveRows()
+
+
+# Category names for the filter and the dialog's completer
+
+class CategoryList(QStringListModel):
+    """Sorted names of the categories in use, loaded once and then kept up to date.
+
+    Saving a task with a new category adds it right away; writes from other
+    connections trigger a reload, which reads the small categories table
+    rather than scanning the tasks.
+    """
 
-    def get_all_tasks(self):
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT id, title, description, due_date, priority, completed, category FROM tasks")
-        rows = cursor.fetchall()
-        tasks = []
-        for row in rows:
-            id, title, description, due_date, priority, completed, category = row
-            task = Task(id, title, description, due_date, priority, bool(completed), category)
-            tasks.append(task)
-        return tasks
+    def __init__(self, executor, parent=None):
+        super(CategoryList, self).__init__(parent)
+        self.executor = executor
 
+    def refresh(self):
+        self.executor.query_async(lambda db: db.categories(), self.setStringList, key="categories")
+
+    def add(self, name):
+        """Insert a category name in sort order unless it is already listed."""
+        names = self.stringList()
+        row = bisect_left(names, name)
+        if not name or (row < len(names) and names[row] == name):
+            return
+        self.insertRows(row, 1)
+        self.setData(self.index(row), name)
+
+
+# CSV import and export, run on worker threads
+
+class CsvImportWorker(QObject):
+    """Streams a CSV file into the database with todo.transfer.import_csv.
+
+    Lives on its own QThread with its own connection. Each batch is committed
+    as it goes, so cancelling keeps the tasks imported so far.
+    """
+    progress = pyqtSignal(int)  # Percent of the file read
+    finished = pyqtSignal(int, int, list)  # Imported, skipped, sample of (line, reason)
+    cancelled = pyqtSignal(int)  # Imported before the cancel
+    failed = pyqtSignal(str)
+
+    def __init__(self, db_file, filename):
+        super(CsvImportWorker, self).__init__()
+        self.db_file = db_file
+        self.filename = filename
+        self.cancel_requested = False
+
+    def cancel(self):
+        self.cancel_requested = True
+
+    def run(self):
+        db = None
+        try:
+            db = TaskDatabase(self.db_file)
+            imported, skipped, errors = import_csv(db, self.filename, progress=self.progress.emit,
+                                                   cancelled=lambda: self.cancel_requested)
+            self.progress.emit(100)
+            self.finished.emit(imported, skipped, errors)
+        except Cancelled as e:
+            self.cancelled.emit(e.imported)
+        except Exception as e:
+            self.failed.emit(str(e))
+        finally:
+            if db is not None:
+                db.conn.close()
+
+
+class ExportWorker(QObject):
+    """Streams the tasks matching a set of filters to a file with todo.transfer.export_tasks.
+
+    The format follows the file name: *.jsonl writes JSON Lines, anything else
+    CSV, and a trailing .gz compresses either with gzip. Cancelling removes the
+    partly written file.
+    """
+    progress = pyqtSignal(int)  # Percent of the rows written
+    finished = pyqtSignal(int)  # Rows written
+    cancelled = pyqtSignal()
+    failed = pyqtSignal(str)
+
+    def __init__(self, db_file, filename, filters):
+        super(ExportWorker, self).__init__()
+        self.db_file = db_file
+        self.filename = filename
+        self.filters = filters  # query_tasks keyword arguments, including the sort
+        self.cancel_requested = False
+
+    def cancel(self):
+        self.cancel_requested = True
+
+    def run(self):
+        db = None
+        try:
+            db = TaskDatabase(self.db_file)
+            written = export_tasks(db, self.filename, self.filters, progress=self.progress.emit,
+                                   cancelled=lambda: self.cancel_requested)
+            self.progress.emit(100)
+            self.finished.emit(written)
+        except Cancelled:
+            self.cancelled.emit()
+        except Exception as e:
+            self.failed.emit(str(e))
+        finally:
+            if db is not None:
+                db.conn.close()
+
+
+# Statistics dashboard
+
+class StatsPanel(QWidget):
+    """Task counts from TaskDatabase.task_stats, queried in the background.
+
+    Results are kept under the change log version they were computed at, so
+    a refresh after rows merely moved (filtering, sorting) costs a single
+    max(version) lookup, and only writes re-run the aggregates.
+    """
+    REFRESH_DELAY_MS = 500  # Collects the row updates of one write into one refresh
+    MAX_CATEGORIES = 10
+    FIELDS = [
+        ("total", "Total:"),
+        ("completed", "Completed:"),
+        ("overdue", "Overdue:"),
+        ("due_today", "Due today:"),
+        ("due_this_week", "Due this week:"),
+        ("by_priority", "By priority:"),
+        ("by_category", "By category:"),
+        ("completion_by_week", "Completed, by due week:"),
+    ]
+
+    def __init__(self, executor, parent=None):
+        super(StatsPanel, self).__init__(parent)
+        self.executor = executor
+        self.version = None  # (change version, date) of the stats shown
+
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setSingleShot(True)
+        self.refresh_timer.setInterval(self.REFRESH_DELAY_MS)
+        self.refresh_timer.timeout.connect(self.refresh)
+
+        self.labels = {}
+        form_layout = QFormLayout()
+        for name, text in self.FIELDS:
+            self.labels[name] = QLabel("...")
+            form_layout.addRow(text, self.labels[name])
+        self.setLayout(form_layout)
+
+    def schedule_refresh(self):
+        """Refresh once the tasks stop changing, if the panel is on screen."""
+        if self.isVisible():
+            self.refresh_timer.start()
+
+    def showEvent(self, event):
+        super(StatsPanel, self).showEvent(event)
+        self.refresh()
+
+    def refresh(self):
+        self.refresh_timer.stop()
+        shown = self.version
+        today = date.today().isoformat()  # Overdue and due counts move at midnight too
+
+        def load(db):
+            version = (db.change_version(), today)
+            if version == shown:
+                return version, None
+            return version, db.task_stats(today)
+
+        self.executor.query_async(load, self.loaded, key="stats")
+
+    def loaded(self, result):
+        self.version, stats = result
+        if stats is None:
+            return
+        total = stats["total"]
+        rate = f" ({stats['completed'] * 100 // total}%)" if total else ""
+        self.labels["total"].setText(str(total))
+        self.labels["completed"].setText(f"{stats['completed']}{rate}")
+        for name in ("overdue", "due_today", "due_this_week"):
+            self.labels[name].setText(str(stats[name]))
+        lines = [f"{priority}: {stats['by_priority'].get(priority, 0)}" for priority in PRIORITIES]
+        if None in stats["by_priority"]:
+            lines.append(f"None: {stats['by_priority'][None]}")
+        self.labels["by_priority"].setText("\n".join(lines))
+        categories = list(stats["by_category"].items())
+        lines = [f"{category or '(none)'}: {count}" for category, count in categories[:self.MAX_CATEGORIES]]
+        if len(categories) > self.MAX_CATEGORIES:
+            lines.append(f"... {len(categories) - self.MAX_CATEGORIES} more")
+        self.labels["by_category"].setText("\n".join(lines))
+        self.labels["completion_by_week"].setText("\n".join(
+            f"{monday}: {completed}/{due}" for monday, due, completed in stats["completion_by_week"]))
+
+
+# Instrumentation (Debug menu, or TODO_PROFILE=1)
+
+class InteractionProfiler(QObject):
+    """Captures a cProfile of the next click or key press, on the GUI and database threads.
+
+    The capture starts at the press and ends once the database thread has
+    answered every request and nothing new was submitted for IDLE_MS.
+    """
+    finished = pyqtSignal(str, str)  # Saved .prof file, top functions as text
+
+    IDLE_MS = 500  # Longer than MainWindow.REFRESH_DELAY_MS, so a debounced search is included
+    CHECK_INTERVAL_MS = 50
+
+    def __init__(self, executor, parent=None):
+        super(InteractionProfiler, self).__init__(parent)
+        self.executor = executor
+        self.armed = False
+        self.idle_since = None
+        self.idle_timer = QTimer(self)
+        self.idle_timer.setInterval(self.CHECK_INTERVAL_MS)
+        self.idle_timer.timeout.connect(self.check_idle)
+
+    def arm(self):
+        """Profile the next interaction."""
+        if not self.armed and not self.idle_timer.isActive():
+            self.armed = True
+            QApplication.instance().installEventFilter(self)
+
+    def eventFilter(self, watched, event):
+        if self.armed and event.type() in (QEvent.MouseButtonPress, QEvent.KeyPress):
+            self.armed = False
+            QApplication.instance().removeEventFilter(self)
+            recorder.start_profile()  # The database thread profiles each request while this runs
+            recorder.profile_thread()
+            self.idle_since = None
+            self.idle_timer.start()
+        return False
+
+    def check_idle(self):
+        if self.executor.callbacks:
+            self.idle_since = None
+            return
+        now = time.perf_counter()
+        if self.idle_since is None:
+            self.idle_since = now
+        elif (now - self.idle_since) * 1000 >= self.IDLE_MS:
+            self.idle_timer.stop()
+            recorder.stop_profile_thread()
+            # Finish behind anything the database thread is still running
+            self.executor.query_async(lambda db: None, lambda _: self.stop())
+
+    def stop(self):
+        import tempfile
+
+        filename = os.path.join(tempfile.gettempdir(), time.strftime("todo-%Y%m%d-%H%M%S.prof"))
+        self.finished.emit(filename, recorder.finish_profile(filename))
+
+
+class DebugPanel(QWidget):
+    """Shows the recorder's timings and counters, and the last interaction profile."""
+    UPDATE_INTERVAL_MS = 1000
+
+    def __init__(self, executor, parent=None):
+        super(DebugPanel, self).__init__(parent)
+        self.profiler = InteractionProfiler(executor, self)
+        self.profiler.finished.connect(self.profiled)
+
+        self.update_timer = QTimer(self)
+        self.update_timer.setInterval(self.UPDATE_INTERVAL_MS)
+        self.update_timer.timeout.connect(self.update_report)
+
+        font = QFontDatabase.systemFont(QFontDatabase.FixedFont)
+        self.report_view = QPlainTextEdit()
+        self.report_view.setReadOnly(True)
+        self.report_view.setLineWrapMode(QPlainTextEdit.NoWrap)
+        self.report_view.setFont(font)
+        self.profile_label = QLabel()
+        self.profile_view = QPlainTextEdit()
+        self.profile_view.setReadOnly(True)
+        self.profile_view.setLineWrapMode(QPlainTextEdit.NoWrap)
+        self.profile_view.setFont(font)
+        self.profile_view.hide()
+
+        self.reset_button = QPushButton("Reset")
+        self.save_button = QPushButton("Save JSON")
+        self.profile_button = QPushButton("Profile Next Click")
+        self.reset_button.clicked.connect(self.reset)
+        self.save_button.clicked.connect(self.save)
+        self.profile_button.clicked.connect(self.arm_profiler)
+
+        button_layout = QHBoxLayout()
+        button_layout.addWidget(self.reset_button)
+        button_layout.addWidget(self.save_button)
+        button_layout.addWidget(self.profile_button)
+
+        layout = QVBoxLayout()
+        layout.addLayout(button_layout)
+        layout.addWidget(self.report_view)
+        layout.addWidget(self.profile_label)
+        layout.addWidget(self.profile_view)
+        self.setLayout(layout)
+
+    def showEvent(self, event):
+        super(DebugPanel, self).showEvent(event)
+        self.update_report()
+        self.update_timer.start()
+
+    def hideEvent(self, event):
+        super(DebugPanel, self).hideEvent(event)
+        self.update_timer.stop()
+
+    def update_report(self):
+        if recorder.enabled:
+            self.report_view.setPlainText(recorder.report())
+        else:
+            self.report_view.setPlainText("Timings are off; turn them on with Debug > Record Timings.")
+
+    def reset(self):
+        recorder.reset()
+        self.update_report()
+
+    def save(self):
+        filename, _ = QFileDialog.getSaveFileName(self, "Save Timings", "todo-timings.json", "JSON Files (*.json)")
+        if filename:
+            recorder.dump(filename)
+
+    def arm_profiler(self):
+        self.profiler.arm()
+        self.profile_label.setText("Profiling the next click or key press...")
+
+    def profiled(self, filename, text):
+        self.profile_label.setText(f"Saved to {filename}")
+        self.profile_view.setPlainText(text)
+        self.profile_view.show()
 
 
 # Adding/Editing a Task
 
 class TaskDialog(QDialog):
-    def __init__(self, parent=None, task=None):
+    def __init__(self, parent=None, task=None, categories=None):
         super(TaskDialog, self).__init__(parent)
         self.setWindowTitle("Add Task" if task is None else "Edit Task")
         self.task = task
@@ -94,8 +857,13 @@ class TaskDialog(QDialog):
         self.due_date_edit.setCalendarPopup(True)
         self.due_date_edit.setDate(QDate.currentDate())
         self.priority_combo = QComboBox()
-        self.priority_combo.addItems(["Low", "Medium", "High"])
+        self.priority_combo.addItems(PRIORITIES)
         self.category_edit = QLineEdit()
+        if categories is not None:
+            # Suggest existing names so that typos do not create near-duplicate categories
+            completer = QCompleter(categories, self)
+            completer.setCaseSensitivity(Qt.CaseInsensitive)
+            self.category_edit.setCompleter(completer)
         self.completed_checkbox = QCheckBox("Completed")
 
         # Layout using QFormLayout
@@ -130,7 +898,8 @@ class TaskDialog(QDialog):
                 dt = QDate.fromString(task.due_date, "yyyy-MM-dd")
                 if dt.isValid():
                     self.due_date_edit.setDate(dt)
-            self.priority_combo.setCurrentText(task.priority)
+            if task.priority:
+                self.priority_combo.setCurrentText(task.priority)
             self.category_edit.setText(task.category)
             self.completed_checkbox.setChecked(task.completed)
 
@@ -153,113 +922,155 @@ class TaskDialog(QDialog):
 
 
 
+# Themes: application-wide stylesheets, built once at import
+
+THEMES = {
+    "light": """
+        QMainWindow {
+            background-color: #f5f5f5;
+        }
+        QTableView {
+            background-color: #ffffff;
+            border: 1px solid #cccccc;
+        }
+        QPushButton {
+            background-color: #4CAF50;
+            color: white;
+            border: none;
+            padding: 8px 16px;
+            border-radius: 4px;
+        }
+        QPushButton:hover {
+            background-color: #45a049;
+        }
+        QLineEdit, QComboBox, QTextEdit, QDateEdit {
+            padding: 4px;
+            border: 1px solid #cccccc;
+            border-radius: 4px;
+        }
+        QLabel {
+            font-weight: bold;
+        }
+    """,
+    "dark": """
+        QMainWindow {
+            background-color: #2b2b2b;
+            color: #ffffff;
+        }
+        QTableView {
+            background-color: #3c3f41;
+            color: #ffffff;
+            border: 1px solid #555555;
+        }
+        QPushButton {
+            background-color: #007ACC;
+            color: white;
+            border: none;
+            padding: 8px 16px;
+            border-radius: 4px;
+        }
+        QPushButton:hover {
+            background-color: #005F9E;
+        }
+        QLineEdit, QComboBox, QTextEdit, QDateEdit {
+            padding: 4px;
+            border: 1px solid #555555;
+            border-radius: 4px;
+            background-color: #3c3f41;
+            color: #ffffff;
+        }
+        QLabel {
+            font-weight: bold;
+            color: #ffffff;
+        }
+    """,
+}
+
+
+def apply_theme(name):
+    """Set a theme's stylesheet on the application, unless it is already the current one.
+
+    Setting a stylesheet re-polishes every existing widget, so it is best done
+    before the widgets are created.
+    """
+    app = QApplication.instance()
+    if app.styleSheet() != THEMES[name]:
+        app.setStyleSheet(THEMES[name])
+
+
 # Main Window
 
 class MainWindow(QMainWindow):
-    def __init__(self):
+    REFRESH_DELAY_MS = 200  # Quiet period before a search/filter change is queried
+    WATCH_INTERVAL_MS = 1000  # How often to look for writes from other windows and scripts
+
+    def __init__(self, db_file="tasks.db"):
         super(MainWindow, self).__init__()
         self.setWindowTitle("To-Do List App")
         self.resize(900, 650)
-
-        self.db = TaskDatabase()  # Handles database operations
-        self.tasks = []
-
-        # Themes
-        self.light_theme = """
-            QMainWindow {
-                background-color: #f5f5f5;
-            }
-            QTableWidget {
-                background-color: #ffffff;
-                border: 1px solid #cccccc;
-            }
-            QPushButton {
-                background-color: #4CAF50;
-                color: white;
-                border: none;
-                padding: 8px 16px;
-                border-radius: 4px;
-            }
-            QPushButton:hover {
-                background-color: #45a049;
-            }
-            QLineEdit, QComboBox, QTextEdit, QDateEdit {
-                padding: 4px;
-                border: 1px solid #cccccc;
-                border-radius: 4px;
-            }
-            QLabel {
-                font-weight: bold;
-            }
-        """
-        self.dark_theme = """
-            QMainWindow {
-                background-color: #2b2b2b;
-                color: #ffffff;
-            }
-            QTableWidget {
-                background-color: #3c3f41;
-                color: #ffffff;
-                border: 1px solid #555555;
-            }
-            QPushButton {
-                background-color: #007ACC;
-                color: white;
-                border: none;
-                padding: 8px 16px;
-                border-radius: 4px;
-            }
-            QPushButton:hover {
-                background-color: #005F9E;
-            }
-            QLineEdit, QComboBox, QTextEdit, QDateEdit {
-                padding: 4px;
-                border: 1px solid #555555;
-                border-radius: 4px;
-                background-color: #3c3f41;
-                color: #ffffff;
-            }
-            QLabel {
-                font-weight: bold;
-                color: #ffffff;
-            }
-        """
         self.dark_mode = False  # Start in light mode
+        apply_theme("light")  # Before the child widgets exist, so each is styled once as it is created
 
+        self.executor = DatabaseExecutor(db_file, self)  # Runs database operations off the GUI thread
+        self.executor.error.connect(self.database_error)
+        self.model = TaskTableModel(self.executor, self)
+        self.stats_panel = StatsPanel(self.executor)
+        self.categories = CategoryList(self.executor, self)
+        self.worker_thread = None  # Thread of the running/last import or export
 
         self.main_widget = QWidget()
         self.setCentralWidget(self.main_widget)
 
 
+        # Search/filter changes restart this timer; the query runs once input goes quiet
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setSingleShot(True)
+        self.refresh_timer.setInterval(self.REFRESH_DELAY_MS)
+        self.refresh_timer.timeout.connect(self.refresh_tasks)
+
+        # Picks up tasks.db changes made elsewhere and applies them to the rows shown
+        self.watch_timer = QTimer(self)
+        self.watch_timer.setInterval(self.WATCH_INTERVAL_MS)
+        self.watch_timer.timeout.connect(self.model.poll_changes)
+
         self.search_bar = QLineEdit()
         self.search_bar.setPlaceholderText("Search tasks...")
-        self.search_bar.textChanged.connect(self.refresh_tasks)
+        self.search_bar.textChanged.connect(self.schedule_refresh)
 
         self.filter_priority = QComboBox()
         self.filter_priority.addItem("All Priorities")
-        self.filter_priority.addItems(["Low", "Medium", "High"])
-        self.filter_priority.currentIndexChanged.connect(self.refresh_tasks)
+        self.filter_priority.addItems(PRIORITIES)
+        self.filter_priority.currentIndexChanged.connect(self.schedule_refresh)
+
+        self.filter_category = QComboBox()
+        self.filter_category.addItem("All Categories")
+        self.filter_category.currentIndexChanged.connect(self.schedule_refresh)
+        self.categories.modelReset.connect(self.update_category_filter)
+        self.categories.dataChanged.connect(self.update_category_filter)
 
         self.filter_completed = QComboBox()
         self.filter_completed.addItems(["All", "Completed", "Incomplete"])
-        self.filter_completed.currentIndexChanged.connect(self.refresh_tasks)
+        self.filter_completed.currentIndexChanged.connect(self.schedule_refresh)
 
         filter_layout = QHBoxLayout()
         filter_layout.addWidget(QLabel("Search:"))
         filter_layout.addWidget(self.search_bar)
         filter_layout.addWidget(QLabel("Priority:"))
         filter_layout.addWidget(self.filter_priority)
+        filter_layout.addWidget(QLabel("Category:"))
+        filter_layout.addWidget(self.filter_category)
         filter_layout.addWidget(QLabel("Status:"))
         filter_layout.addWidget(self.filter_completed)
 
 
-        self.table = QTableWidget()
-        self.table.setColumnCount(6)
-        self.table.setHorizontalHeaderLabels(["ID", "Title", "Due Date", "Priority", "Category", "Completed"])
+        self.table = QTableView()
+        self.table.setModel(self.model)
         self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
-        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
-        self.table.setSelectionBehavior(QTableWidget.SelectRows)
-        self.table.setSortingEnabled(True)  # Enable sorting by clicking on column headers
+        self.table.setEditTriggers(QTableView.NoEditTriggers)
+        self.table.setSelectionBehavior(QTableView.SelectRows)
+        # Indicator first: enabling sorting applies it, and no indicator is the model's own default order
+        self.table.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+        self.table.setSortingEnabled(True)  # Header clicks call TaskTableModel.sort
 
 
         self.add_button = QPushButton("Add Task")
@@ -280,16 +1091,18 @@ class MainWindow(QMainWindow):
 
         # --- Extra Feature Buttons ---
         self.clear_completed_button = QPushButton("Clear Completed")
-        self.export_csv_button = QPushButton("Export CSV")
+        self.export_csv_button = QPushButton("Export")
         self.import_csv_button = QPushButton("Import CSV")
         self.toggle_theme_button = QPushButton("Toggle Theme")
         self.mark_all_completed_button = QPushButton("Mark All Completed")
+        self.stats_button = QPushButton("Statistics")
 
         self.clear_completed_button.clicked.connect(self.clear_completed_tasks)
         self.export_csv_button.clicked.connect(self.export_tasks_csv)
         self.import_csv_button.clicked.connect(self.import_tasks_csv)
         self.toggle_theme_button.clicked.connect(self.toggle_theme)
         self.mark_all_completed_button.clicked.connect(self.mark_all_completed)
+        self.stats_button.clicked.connect(self.toggle_stats)
 
         extra_button_layout = QHBoxLayout()
         extra_button_layout.addWidget(self.clear_completed_button)
@@ -297,6 +1110,7 @@ class MainWindow(QMainWindow):
         extra_button_layout.addWidget(self.import_csv_button)
         extra_button_layout.addWidget(self.toggle_theme_button)
         extra_button_layout.addWidget(self.mark_all_completed_button)
+        extra_button_layout.addWidget(self.stats_button)
 
         # Main layout
         main_layout = QVBoxLayout()
@@ -307,51 +1121,89 @@ class MainWindow(QMainWindow):
 
         self.main_widget.setLayout(main_layout)
 
-        # Theme
-        QApplication.instance().setStyleSheet(self.light_theme)
+        # Statistics dock, hidden until the Statistics button is clicked
+        self.stats_dock = QDockWidget("Statistics", self)
+        self.stats_dock.setWidget(self.stats_panel)
+        self.addDockWidget(Qt.RightDockWidgetArea, self.stats_dock)
+        self.stats_dock.hide()
+        self.model.changed.connect(self.stats_panel.schedule_refresh)
+        self.model.changed.connect(self.categories.refresh)
+
+        # Instrumentation dock and the Debug menu that controls it
+        self.debug_panel = DebugPanel(self.executor)
+        self.debug_dock = QDockWidget("Instrumentation", self)
+        self.debug_dock.setWidget(self.debug_panel)
+        self.addDockWidget(Qt.BottomDockWidgetArea, self.debug_dock)
+        self.debug_dock.hide()
+        debug_menu = self.menuBar().addMenu("&Debug")
+        self.record_timings_action = debug_menu.addAction("Record Timings")
+        self.record_timings_action.setCheckable(True)
+        self.record_timings_action.setChecked(recorder.enabled)
+        self.record_timings_action.toggled.connect(self.set_recording)
+        debug_menu.addAction(self.debug_dock.toggleViewAction())
 
         self.refresh_tasks()  # Load tasks from the database
+        self.categories.refresh()
+        self.watch_timer.start()
 
-    def refresh_tasks(self):
-        """Reload tasks from the database and apply search/filter criteria."""
-        self.tasks = self.db.get_all_tasks()
-
-        # Filter by search keyword
-        keyword = self.search_bar.text().lower()
-        if keyword:
-            self.tasks = [task for task in self.tasks
-                          if keyword in task.title.lower() or keyword in task.description.lower()]
+    def schedule_refresh(self):
+        """Refresh once the search/filter widgets stop changing for REFRESH_DELAY_MS."""
+        self.refresh_timer.start()
 
-        # Filter by priority
+    def refresh_tasks(self):
+        """Re-run the query for the current search/filter criteria."""
+        self.refresh_timer.stop()
+        with recorder.timed("window.refresh_tasks"):
+            filters = self.current_filters()
+            if filters["keyword"].strip() and filters["keyword"] != self.model.filters.get("keyword"):
+                self.clear_sort()  # A new search starts out by relevance
+            self.model.set_filters(filters)
+
+    def clear_sort(self):
+        """Go back to the default order and clear the header's sort indicator, without a reload of its own."""
+        self.model.sort_column = None
+        self.model.descending = False
+        header = self.table.horizontalHeader()
+        header.blockSignals(True)
+        header.setSortIndicator(-1, Qt.AscendingOrder)
+        header.blockSignals(False)
+        header.viewport().update()
+
+    def update_category_filter(self):
+        """Rebuild the category filter's items from the category list, keeping the selection."""
+        current = self.filter_category.currentText()
+        self.filter_category.blockSignals(True)
+        self.filter_category.clear()
+        self.filter_category.addItem("All Categories")
+        self.filter_category.addItems(self.categories.stringList())
+        index = self.filter_category.findText(current)
+        if index == -1:
+            # The selected category lost its last task; keep it so the filter does not change under the user
+            self.filter_category.addItem(current)
+            index = self.filter_category.count() - 1
+        self.filter_category.setCurrentIndex(index)
+        self.filter_category.blockSignals(False)
+
+    def current_filters(self):
+        """Return the search/filter widgets' state as query_tasks keyword arguments."""
         priority_filter = self.filter_priority.currentText()
-        if priority_filter != "All Priorities":
-            self.tasks = [task for task in self.tasks if task.priority == priority_filter]
-
-        # Filter by completion status
+        category_filter = self.filter_category.currentText()
         completed_filter = self.filter_completed.currentText()
+        completed = None
         if completed_filter == "Completed":
-            self.tasks = [task for task in self.tasks if task.completed]
+            completed = True
         elif completed_filter == "Incomplete":
-            self.tasks = [task for task in self.tasks if not task.completed]
-
-        self.populate_table()
-
-    def populate_table(self):
-        """Populate the QTableWidget with the current list of tasks."""
-        self.table.setRowCount(0)
-        for task in self.tasks:
-            row_position = self.table.rowCount()
-            self.table.insertRow(row_position)
-            self.table.setItem(row_position, 0, QTableWidgetItem(str(task.id)))
-            self.table.setItem(row_position, 1, QTableWidgetItem(task.title))
-            self.table.setItem(row_position, 2, QTableWidgetItem(task.due_date))
-            self.table.setItem(row_position, 3, QTableWidgetItem(task.priority))
-            self.table.setItem(row_position, 4, QTableWidgetItem(task.category))
-            self.table.setItem(row_position, 5, QTableWidgetItem("Yes" if task.completed else "No"))
+            completed = False
+        return {
+            "keyword": self.search_bar.text(),
+            "priority": None if priority_filter == "All Priorities" else priority_filter,
+            "category": None if category_filter == "All Categories" else category_filter,
+            "completed": completed,
+        }
 
     def add_task(self):
         """Open the Add Task dialog and add a new task if accepted."""
-        dialog = TaskDialog(self)
+        dialog = TaskDialog(self, categories=self.categories)
         if dialog.exec_() == QDialog.Accepted:
             data = dialog.get_task_data()
             if not data["title"]:
@@ -359,70 +1211,82 @@ class MainWindow(QMainWindow):
                 return
             new_task = Task(None, data["title"], data["description"], data["due_date"],
                             data["priority"], data["completed"], data["category"])
-            self.db.add_task(new_task)
-            self.refresh_tasks()
+            self.model.add_task(new_task)
+            self.categories.add(new_task.category.strip())
 
     def get_selected_task(self):
         """Return the Task object corresponding to the currently selected row."""
-        selected_items = self.table.selectedItems()
-        if selected_items:
-            task_id = int(selected_items[0].text())
-            for task in self.tasks:
-                if task.id == task_id:
-                    return task
+        selected_rows = self.table.selectionModel().selectedRows()
+        if selected_rows:
+            return self.model.task_at(selected_rows[0].row())
         return None
 
+    def get_selected_tasks(self):
+        """Return the Task objects of every selected row."""
+        return [self.model.task_at(index.row()) for index in self.table.selectionModel().selectedRows()]
+
     def edit_task(self):
         """Open the Edit Task dialog for the selected task."""
         task = self.get_selected_task()
         if task:
-            dialog = TaskDialog(self, task)
+            dialog = TaskDialog(self, task, self.categories)
             if dialog.exec_() == QDialog.Accepted:
                 data = dialog.get_task_data()
                 if not data["title"]:
                     QMessageBox.warning(self, "Validation Error", "Title cannot be empty.")
                     return
-                task.title = data["title"]
-                task.description = data["description"]
-                task.due_date = data["due_date"]
-                task.priority = data["priority"]
-                task.category = data["category"]
-                task.completed = data["completed"]
-                self.db.update_task(task)
-                self.refresh_tasks()
+                # A copy: the row (and the query cache) keep the saved values until the write succeeds
+                self.model.save_task(Task(id=task.id, **data))
+                self.categories.add(data["category"].strip())
         else:
             QMessageBox.warning(self, "No selection", "Please select a task to edit.")
 
     def delete_task(self):
-        """Delete the currently selected task after confirmation."""
-        task = self.get_selected_task()
-        if task:
+        """Delete the selected task(s) after confirmation."""
+        tasks = self.get_selected_tasks()
+        if len(tasks) == 1:
+            task = tasks[0]
             reply = QMessageBox.question(
                 self, "Confirm Delete",
                 f"Are you sure you want to delete task '{task.title}'?",
                 QMessageBox.Yes | QMessageBox.No
             )
             if reply == QMessageBox.Yes:
-                self.db.delete_task(task.id)
-                self.refresh_tasks()
+                self.model.delete_task(task.id)
+        elif tasks:
+            reply = QMessageBox.question(
+                self, "Confirm Delete",
+                f"Are you sure you want to delete {len(tasks)} tasks?",
+                QMessageBox.Yes | QMessageBox.No
+            )
+            if reply == QMessageBox.Yes:
+                ids = [task.id for task in tasks]
+                self.executor.mutate_async(lambda db: db.delete_where(ids=ids))
+                self.refresh_tasks()  # Queued behind the delete
         else:
             QMessageBox.warning(self, "No selection", "Please select a task to delete.")
 
     def toggle_completed(self):
-        """Toggle the completion status of the selected task."""
-        task = self.get_selected_task()
-        if task:
-            task.completed = not task.completed
-            self.db.update_task(task)
-            self.refresh_tasks()
+        """Toggle the completion status of the selected task(s)."""
+        tasks = self.get_selected_tasks()
+        # Copies: the rows (and the query cache) keep the saved values until the write succeeds
+        toggled = [Task(task.id, task.title, task.description, task.due_date, task.priority, not task.completed,
+                        task.category) for task in tasks]
+        if len(toggled) == 1:
+            self.model.save_task(toggled[0])
+        elif toggled:
+            self.executor.mutate_async(lambda db: db.update_many(toggled))
+            self.refresh_tasks()  # Queued behind the update
         else:
             QMessageBox.warning(self, "No selection", "Please select a task to toggle its completion status.")
 
 
     def clear_completed_tasks(self):
         """Delete all tasks that are marked as completed."""
-        completed_tasks = [task for task in self.db.get_all_tasks() if task.completed]
-        if not completed_tasks:
+        self.executor.query_async(lambda db: db.count_tasks(completed=True), self.confirm_clear_completed)
+
+    def confirm_clear_completed(self, count):
+        if count == 0:
             QMessageBox.information(self, "Info", "No completed tasks to clear.")
             return
         reply = QMessageBox.question(
@@ -431,118 +1295,136 @@ class MainWindow(QMainWindow):
             QMessageBox.Yes | QMessageBox.No
         )
         if reply == QMessageBox.Yes:
-            for task in completed_tasks:
-                self.db.delete_task(task.id)
-            self.refresh_tasks()
+            self.executor.mutate_async(lambda db: db.delete_where(completed=True))
+            self.refresh_tasks()  # Queued behind the delete
 
     def mark_all_completed(self):
         """Mark all tasks as completed."""
-        tasks_updated = False
-        for task in self.db.get_all_tasks():
-            if not task.completed:
-                task.completed = True
-                self.db.update_task(task)
-                tasks_updated = True
-        if tasks_updated:
+        self.executor.mutate_async(lambda db: db.set_completed_where(True), self.marked_all_completed)
+        self.refresh_tasks()  # Queued behind the update
+
+    def marked_all_completed(self, updated):
+        if updated:
             QMessageBox.information(self, "Success", "All tasks have been marked as completed.")
         else:
             QMessageBox.information(self, "Info", "All tasks were already completed.")
-        self.refresh_tasks()
+
+    def toggle_stats(self):
+        """Show or hide the statistics dock."""
+        self.stats_dock.setVisible(not self.stats_dock.isVisible())
+
+    def set_recording(self, enabled):
+        """Start or stop recording timings (Debug > Record Timings)."""
+        recorder.enabled = enabled
+        self.debug_panel.update_report()
+
+    def database_error(self, message):
+        QMessageBox.critical(self, "Error", f"A database error occurred:\n{message}")
+
+    def run_worker(self, worker, label, title, on_finished, on_cancelled, on_failed):
+        """Run an import/export worker on its own QThread behind a cancellable progress dialog."""
+        self.worker_progress = QProgressDialog(label, "Cancel", 0, 100, self)
+        self.worker_progress.setWindowTitle(title)
+        self.worker_progress.setMinimumDuration(0)
+
+        if self.worker_thread is not None:
+            self.worker_thread.deleteLater()  # The previous run's thread, long finished
+        self.worker_thread = QThread(self)
+        self.worker = worker
+        worker.moveToThread(self.worker_thread)
+        self.worker_thread.started.connect(worker.run)
+        worker.progress.connect(self.worker_progress.setValue)
+        # Direct connection: the worker's thread is busy in run(), so a queued call would never arrive
+        self.worker_progress.canceled.connect(worker.cancel, Qt.DirectConnection)
+        for signal in (worker.finished, worker.cancelled, worker.failed):
+            signal.connect(self.end_worker)
+            # Direct, so the thread stops even if the GUI thread is blocked waiting for it
+            signal.connect(self.worker_thread.quit, Qt.DirectConnection)
+        worker.finished.connect(on_finished)
+        worker.cancelled.connect(on_cancelled)
+        worker.failed.connect(on_failed)
+        self.worker_thread.finished.connect(worker.deleteLater)
+        self.import_csv_button.setEnabled(False)
+        self.export_csv_button.setEnabled(False)
+        self.worker_thread.start()
+
+    def end_worker(self):
+        self.worker_progress.reset()
+        self.import_csv_button.setEnabled(True)
+        self.export_csv_button.setEnabled(True)
 
     def export_tasks_csv(self):
-        """Export all tasks to a CSV file."""
+        """Export the tasks matching the current filters on a background thread."""
         options = QFileDialog.Options()
-        filename, _ = QFileDialog.getSaveFileName(self, "Export Tasks to CSV", "", "CSV Files (*.csv)", options=options)
-        if filename:
-            try:
-                with open(filename, mode='w', newline='', encoding='utf-8') as file:
-                    writer = csv.writer(file)
-                    # Write header row
-                    writer.writerow(["Title", "Description", "Due Date", "Priority", "Completed", "Category"])
-                    for task in self.db.get_all_tasks():
-                        writer.writerow([
-                            task.title,
-                            task.description,
-                            task.due_date,
-                            task.priority,
-                            "Yes" if task.completed else "No",
-                            task.category
-                        ])
-                QMessageBox.information(self, "Success", f"Tasks exported successfully to {filename}")
-            except Exception as e:
-                QMessageBox.critical(self, "Error", f"An error occurred while exporting tasks:\n{e}")
+        filename, _ = QFileDialog.getSaveFileName(
+            self, "Export Tasks", "",
+            "CSV Files (*.csv);;Gzipped CSV Files (*.csv.gz);;JSON Lines Files (*.jsonl);;"
+            "Gzipped JSON Lines Files (*.jsonl.gz)",
+            options=options
+        )
+        if not filename:
+            return
+        filters = self.current_filters()
+        filters["sort"] = self.model.sort_column
+        filters["descending"] = self.model.descending
+        worker = ExportWorker(self.executor.db_file, filename, filters)
+        self.run_worker(worker, "Exporting tasks...", "Export Tasks",
+                        self.export_finished, self.export_cancelled, self.export_failed)
+
+    def export_finished(self, written):
+        QMessageBox.information(self, "Success", f"{written} tasks exported successfully to {self.worker.filename}")
+
+    def export_cancelled(self):
+        QMessageBox.information(self, "Info", "Export cancelled.")
+
+    def export_failed(self, error):
+        QMessageBox.critical(self, "Error", f"An error occurred while exporting tasks:\n{error}")
 
     def import_tasks_csv(self):
-        """Import tasks from a CSV file."""
+        """Import tasks from a CSV file on a background thread."""
         options = QFileDialog.Options()
         filename, _ = QFileDialog.getOpenFileName(self, "Import Tasks from CSV", "", "CSV Files (*.csv)",
                                                   options=options)
-        if filename:
-            try:
-                with open(filename, mode='r', newline='', encoding='utf-8') as file:
-                    reader = csv.reader(file)
-                    header = next(reader, None)  # Skip header row if present
-                    count = 0
-                    for row in reader:
-                        if len(row) < 6:
-                            continue  # Skip invalid rows
-                        title, description, due_date, priority, completed_str, category = row[:6]
-                        completed = True if completed_str.strip().lower() in ["yes", "true", "1"] else False
-                        if not title.strip():
-                            continue  # Skip tasks without a title
-                        new_task = Task(None, title.strip(), description.strip(), due_date.strip(),
-                                        priority.strip(), completed, category.strip())
-                        self.db.add_task(new_task)
-                        count += 1
-                QMessageBox.information(self, "Success", f"{count} tasks imported successfully from {filename}")
-                self.refresh_tasks()
-            except Exception as e:
-                QMessageBox.critical(self, "Error", f"An error occurred while importing tasks:\n{e}")
+        if not filename:
+            return
+        worker = CsvImportWorker(self.executor.db_file, filename)
+        self.run_worker(worker, "Importing tasks...", "Import CSV",
+                        self.import_finished, self.import_cancelled, self.import_failed)
+
+    def import_finished(self, imported, skipped, errors):
+        message = f"{imported} tasks imported successfully."
+        if skipped:
+            message += f"\n{skipped} rows were skipped:"
+            message += "".join(f"\n  line {line}: {reason}" for line, reason in errors)
+            if skipped > len(errors):
+                message += f"\n  ... and {skipped - len(errors)} more"
+        QMessageBox.information(self, "Success", message)
+        self.refresh_tasks()
+
+    def import_cancelled(self, imported):
+        QMessageBox.information(self, "Info", f"Import cancelled; {imported} tasks were imported before it stopped.")
+        self.refresh_tasks()
+
+    def import_failed(self, error):
+        QMessageBox.critical(self, "Error", f"An error occurred while importing tasks:\n{error}")
+
+    def closeEvent(self, event):
+        self.watch_timer.stop()
+        if self.worker_thread is not None and self.worker_thread.isRunning():
+            self.worker.cancel()
+            self.worker_thread.wait()
+        self.executor.shutdown()
+        super(MainWindow, self).closeEvent(event)
 
     def toggle_theme(self):
         """Toggle between light and dark themes."""
-        app = QApplication.instance()
-        if self.dark_mode:
-            app.setStyleSheet(self.light_theme)
-            self.dark_mode = False
-        else:
-            app.setStyleSheet(self.dark_theme)
-            self.dark_mode = True
+        self.dark_mode = not self.dark_mode
+        apply_theme("dark" if self.dark_mode else "light")
 
 
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
-
-    # Light theme (the MainWindow.toggle_theme method will override this)
-    app.setStyleSheet("""
-        QMainWindow {
-            background-color: #f5f5f5;
-        }
-        QTableWidget {
-            background-color: #ffffff;
-            border: 1px solid #cccccc;
-        }
-        QPushButton {
-            background-color: #4CAF50;
-            color: white;
-            border: none;
-            padding: 8px 16px;
-            border-radius: 4px;
-        }
-        QPushButton:hover {
-            background-color: #45a049;
-        }
-        QLineEdit, QComboBox, QTextEdit, QDateEdit {
-            padding: 4px;
-            border: 1px solid #cccccc;
-            border-radius: 4px;
-        }
-        QLabel {
-            font-weight: bold;
-        }
-    """)
-
-    window = MainWindow()
+    window = MainWindow()  # Applies the light theme itself
     window.show()
     sys.exit(app.exec_())
@@ -0,0 +1,82 @@
+"""TaskTableModel against a real database on the offscreen Qt platform; skipped without PyQt5.
+
+    python -m unittest discover tests
+"""
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # Run from a checkout
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+try:
+    from PyQt5.QtCore import QEventLoop
+    from PyQt5.QtWidgets import QApplication
+except ImportError:
+    QApplication = None
+
+from todo.database import TaskDatabase
+from todo.tasks import Task
+
+
+@unittest.skipIf(QApplication is None, "PyQt5 is not installed")
+class InsertWhileFetchingTest(unittest.TestCase):
+    """A task saved while a page is in flight must end up exactly once, in sort order."""
+
+    def setUp(self):
+        import main
+
+        self.app = QApplication.instance() or QApplication([])
+        self.directory = tempfile.TemporaryDirectory()
+        db_file = os.path.join(self.directory.name, "tasks.db")
+        db = TaskDatabase(db_file)
+        rows = 3 * main.TaskTableModel.PAGE_SIZE
+        db.add_many((f"task {number:04d}", "", None, "Low", False, "") for number in range(rows))
+        db.conn.close()
+        self.executor = main.DatabaseExecutor(db_file)
+        self.model = main.TaskTableModel(self.executor)
+
+    def tearDown(self):
+        self.executor.shutdown()
+        self.directory.cleanup()
+
+    def drain_first_page(self):
+        while self.model.loading:
+            self.app.processEvents(QEventLoop.WaitForMoreEvents)
+
+    def drain(self):
+        """Process events until every request has been answered, then fetch the remaining pages."""
+        while True:
+            while self.executor.callbacks:
+                self.app.processEvents(QEventLoop.WaitForMoreEvents)
+            if not self.model.canFetchMore():
+                return
+            self.model.fetchMore()
+
+    def check_rows(self, key):
+        ids = [task.id for task in self.model.tasks]
+        self.assertEqual(len(ids), len(set(ids)), "a row appears twice")
+        self.assertEqual(len(ids), self.model.total)
+        self.assertEqual(len(ids), 3 * self.model.PAGE_SIZE + 1)
+        self.assertEqual(self.model.tasks, sorted(self.model.tasks, key=key))
+
+    def add_during_fetch(self, title):
+        self.model.set_filters({})
+        self.drain_first_page()
+        self.model.add_task(Task(None, title, "", None, "Low", False, ""))
+        self.model.fetchMore()  # In flight when the add's result arrives
+        self.drain()
+
+    def test_sorted_by_title(self):
+        self.model.sort(1)
+        self.add_during_fetch("task 9999")
+        self.check_rows(lambda task: (task.title, task.id))
+
+    def test_sorted_by_id(self):
+        self.add_during_fetch("new task")
+        self.check_rows(lambda task: task.id)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,23 @@
+"""Qt-free task store shared by the GUI (main.py) and the `python -m todo` CLI.
+
+Names are imported on first use so that `import todo` stays cheap.
+"""
+import importlib
+
+_EXPORTS = {
+    "PRIORITIES": "todo.tasks",
+    "Task": "todo.tasks",
+    "TaskBatch": "todo.tasks",
+    "TaskDatabase": "todo.database",
+    "Cancelled": "todo.transfer",
+    "import_csv": "todo.transfer",
+    "export_tasks": "todo.transfer",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module 'todo' has no attribute {name!r}")
+    return getattr(importlib.import_module(_EXPORTS[name]), name)
@@ -0,0 +1,150 @@
+"""Command line interface: `python -m todo [--db FILE] COMMAND ...`.
+
+Works on the same tasks.db as the GUI without importing PyQt5, so it can be
+used from scripts and cron jobs. Modules beyond the database layer are only
+imported by the commands that need them.
+"""
+import argparse
+import os
+import sqlite3
+import sys
+
+from todo.database import TaskDatabase
+from todo.instrumentation import recorder
+from todo.tasks import PRIORITIES, Task
+
+
+def add_filter_arguments(parser):
+    parser.add_argument("--search", help="match words in the title or description")
+    parser.add_argument("--priority", choices=PRIORITIES)
+    parser.add_argument("--category")
+    status = parser.add_mutually_exclusive_group()
+    status.add_argument("--completed", action="store_const", const=True, dest="status",
+                        help="only completed tasks")
+    status.add_argument("--incomplete", action="store_const", const=False, dest="status",
+                        help="only incomplete tasks")
+    parser.add_argument("--sort", choices=TaskDatabase.SORT_COLUMNS)
+    parser.add_argument("--desc", action="store_true", help="sort in descending order")
+
+
+def filters_from_args(args):
+    """Return the query_tasks keyword arguments selected by add_filter_arguments."""
+    return {
+        "keyword": args.search,
+        "priority": args.priority,
+        "completed": args.status,
+        "category": args.category,
+        "sort": args.sort,
+        "descending": args.desc,
+    }
+
+
+def command_add(db, args):
+    task = Task(None, args.title, args.description, args.due, args.priority, args.completed, args.category)
+    db.add_task(task)
+    print(task.id)
+
+
+def command_list(db, args):
+    for task in db.query_tasks(limit=args.limit, **filters_from_args(args)):
+        print("\t".join([str(task.id), task.title, task.due_date or "", task.priority or "",
+                         task.category or "", "Yes" if task.completed else "No"]))
+
+
+def command_complete(db, args):
+    changed = db.set_completed_where(not args.undo, ids=args.ids)
+    print(f"{changed} tasks updated", file=sys.stderr)
+
+
+def command_import(db, args):
+    from todo.transfer import import_csv
+
+    imported, skipped, errors = import_csv(db, args.file)
+    print(f"{imported} tasks imported, {skipped} rows skipped", file=sys.stderr)
+    for line, reason in errors:
+        print(f"  line {line}: {reason}", file=sys.stderr)
+
+
+def command_export(db, args):
+    from todo.transfer import export_tasks
+
+    written = export_tasks(db, args.file, filters_from_args(args), file_format=args.format)
+    print(f"{written} tasks exported", file=sys.stderr)
+
+
+def command_stats(db, args):
+    stats = db.task_stats()
+    for name in ("total", "completed", "incomplete", "overdue", "due_today", "due_this_week"):
+        print(f"{name}\t{stats[name]}")
+    for priority in PRIORITIES:
+        print(f"{priority.lower()}\t{stats['by_priority'].get(priority, 0)}")
+
+
+def command_serve(db, args):
+    from todo.server import serve
+
+    serve(db.db_file, args.host, args.port, args.readers)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="todo", description="Manage the to-do list without the GUI.")
+    parser.add_argument("--db", default=os.environ.get("TODO_DB", "tasks.db"),
+                        help="database file (default: $TODO_DB or tasks.db)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add = commands.add_parser("add", help="add a task and print its id")
+    add.add_argument("title")
+    add.add_argument("--description", default="")
+    add.add_argument("--due", help="due date as yyyy-MM-dd")
+    add.add_argument("--priority", choices=PRIORITIES, default="Low")
+    add.add_argument("--category", default="")
+    add.add_argument("--completed", action="store_true")
+    add.set_defaults(handler=command_add)
+
+    list_ = commands.add_parser("list", help="print matching tasks, tab separated")
+    add_filter_arguments(list_)
+    list_.add_argument("--limit", type=int)
+    list_.set_defaults(handler=command_list)
+
+    complete = commands.add_parser("complete", help="mark tasks completed")
+    complete.add_argument("ids", type=int, nargs="+", metavar="id")
+    complete.add_argument("--undo", action="store_true", help="mark them incomplete instead")
+    complete.set_defaults(handler=command_complete)
+
+    import_ = commands.add_parser("import", help="bulk-import tasks from a CSV file")
+    import_.add_argument("file")
+    import_.set_defaults(handler=command_import)
+
+    export = commands.add_parser("export", help="export matching tasks to a file, or - for stdout")
+    export.add_argument("file")
+    export.add_argument("--format", choices=["csv", "jsonl"],
+                        help="default: jsonl for *.jsonl[.gz] files, csv otherwise")
+    add_filter_arguments(export)
+    export.set_defaults(handler=command_export)
+
+    stats = commands.add_parser("stats", help="print task counts")
+    stats.set_defaults(handler=command_stats)
+
+    serve = commands.add_parser("serve", help="serve the tasks as a local HTTP/JSON API")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8765)
+    serve.add_argument("--readers", type=int, default=4, help="read connections in the pool (default: 4)")
+    serve.set_defaults(handler=command_serve)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    db = None
+    try:
+        db = TaskDatabase(args.db)
+        args.handler(db, args)
+    except (ValueError, OSError, sqlite3.Error) as e:
+        print(f"todo: error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        if db is not None:
+            db.conn.close()
+        if recorder.enabled:  # TODO_PROFILE is set
+            print(recorder.report(), file=sys.stderr)
+    return 0
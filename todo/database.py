@@ -0,0 +1,737 @@
+"""SQLite storage for tasks: schema migrations, queries and bulk writes."""
+import re
+import sqlite3
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+from todo.instrumentation import instrumented, instrumented_batches
+from todo.tasks import PRIORITIES, TaskBatch, category_name, julian_day, priority_rank, task_row_factory
+
+
+# Database Handler  SQLite
+class TaskDatabase:
+    # Columns query_tasks may sort by (whitelisted, since they are formatted into SQL)
+    SORT_COLUMNS = ("id", "title", "due_date", "priority", "category", "completed")
+
+    # Task fields as read back from the typed columns; SQLite turns them into
+    # strings itself, so the row factory does not have to
+    SELECT_COLUMNS = ("tasks.id, tasks.title, tasks.description, date(tasks.due_date),"
+                      " CASE tasks.priority WHEN 0 THEN 'Low' WHEN 1 THEN 'Medium' WHEN 2 THEN 'High' END,"
+                      " tasks.completed, categories.name")
+
+    # Performance profile applied to every connection; override per instance with pragmas=
+    DEFAULT_PRAGMAS = {
+        "journal_mode": "WAL",  # Readers don't block the writer and vice versa
+        "synchronous": "NORMAL",  # Safe with WAL; fsync at checkpoints instead of every commit
+        "mmap_size": 256 * 1024 * 1024,
+        "cache_size": -64 * 1024,  # Negative means KiB, i.e. 64 MiB of page cache
+        "temp_store": "MEMORY",
+        "foreign_keys": "ON",
+    }
+    STATEMENT_CACHE_SIZE = 256  # Prepared statements kept by the sqlite3 module per connection
+    CHANGE_LOG_SIZE = 100000  # Entries kept in task_changes; watchers further behind reload instead
+
+    def __init__(self, db_file="tasks.db", pragmas=None):
+        self.db_file = db_file  # Kept so worker threads can open their own connection
+        self.conn = sqlite3.connect(db_file, cached_statements=self.STATEMENT_CACHE_SIZE)
+        self.write_count = 0  # Bumped by every write through this connection, see data_version
+        self.transaction_depth = 0
+        self.traced = False  # Statement counter attached, see todo.instrumentation
+        self.apply_pragmas(self.DEFAULT_PRAGMAS if pragmas is None else pragmas)
+        self.migrate()
+
+    def apply_pragmas(self, pragmas):
+        cursor = self.conn.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+            cursor.fetchall()
+
+    @contextmanager
+    def transaction(self, immediate=False):
+        """Group writes into one transaction: methods called inside skip their own commit.
+
+        Commits when the outermost block exits and rolls back if it raises. With
+        immediate=True the write lock is taken up front.
+        """
+        if self.transaction_depth == 0 and not self.conn.in_transaction:
+            self.conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+        self.transaction_depth += 1
+        try:
+            yield
+        except BaseException:
+            self.transaction_depth -= 1
+            if self.transaction_depth == 0:
+                self.conn.rollback()
+            raise
+        self.transaction_depth -= 1
+        if self.transaction_depth == 0:
+            self.conn.commit()
+
+    def commit(self):
+        """Commit, unless a transaction() block will commit later."""
+        if self.transaction_depth == 0:
+            self.conn.commit()
+
+    @instrumented
+    def migrate(self):
+        """Bring the schema up to date, tracking the applied steps in PRAGMA user_version.
+
+        Each entry of migrations upgrades the schema by one version and is only
+        ever appended to, never edited.
+        """
+        migrations = [
+            self.create_table,  # 1
+            self.create_fts_table,  # 2
+            self.use_typed_columns,  # 3
+            self.create_change_log,  # 4
+            self.create_sort_indexes,  # 5
+            self.use_category_table,  # 6
+        ]
+        cursor = self.conn.cursor()
+        # Checked without a lock first, so opening a current database never waits for another writer
+        cursor.execute("PRAGMA user_version")
+        if cursor.fetchone()[0] < len(migrations):
+            with self.transaction(immediate=True):
+                # Read again inside the write lock so two connections cannot both migrate
+                cursor.execute("PRAGMA user_version")
+                version = cursor.fetchone()[0]
+                for number, migration in enumerate(migrations[version:], start=version + 1):
+                    migration(cursor)
+                    cursor.execute(f"PRAGMA user_version = {number}")
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='tasks_fts'")
+        self.fts_enabled = cursor.fetchone() is not None
+
+    def create_table(self, cursor):
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                title TEXT NOT NULL,
+                description TEXT,
+                due_date TEXT,
+                priority TEXT,
+                completed INTEGER,
+                category TEXT
+            )
+        """)
+        # Indexes backing the filter and sort columns used by query_tasks
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_tasks_priority ON tasks (priority)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_tasks_completed ON tasks (completed)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_tasks_due_date ON tasks (due_date)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_tasks_category ON tasks (category)")
+
+    def create_fts_table(self, cursor):
+        """Create the FTS5 index over title/description and its sync triggers.
+
+        Does nothing if this SQLite build has no FTS5, in which case searches
+        fall back to LIKE.
+        """
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='tasks_fts'")
+        exists = cursor.fetchone() is not None
+        if not exists:
+            try:
+                cursor.execute("""
+                    CREATE VIRTUAL TABLE tasks_fts USING fts5(
+                        title, description, content='tasks', content_rowid='id'
+                    )
+                """)
+            except sqlite3.OperationalError:
+                return
+        self.create_fts_triggers(cursor)
+        if not exists:
+            # Backfill the index for databases created before it existed
+            cursor.execute("INSERT INTO tasks_fts (tasks_fts) VALUES ('rebuild')")
+
+    def create_fts_triggers(self, cursor):
+        # Keep the external-content index in sync with the tasks table
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS tasks_fts_insert AFTER INSERT ON tasks BEGIN
+                INSERT INTO tasks_fts (rowid, title, description) VALUES (new.id, new.title, new.description);
+            END
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS tasks_fts_delete AFTER DELETE ON tasks BEGIN
+                INSERT INTO tasks_fts (tasks_fts, rowid, title, description)
+                VALUES ('delete', old.id, old.title, old.description);
+            END
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS tasks_fts_update AFTER UPDATE OF title, description ON tasks BEGIN
+                INSERT INTO tasks_fts (tasks_fts, rowid, title, description)
+                VALUES ('delete', old.id, old.title, old.description);
+                INSERT INTO tasks_fts (rowid, title, description) VALUES (new.id, new.title, new.description);
+            END
+        """)
+
+    def use_typed_columns(self, cursor):
+        """Rebuild tasks with integer priority rank, Julian-day due date and 0/1 completed.
+
+        Priorities are matched case-insensitively and dates must be yyyy-mm-dd
+        (optionally followed by a time). Values that cannot be mapped, e.g. an
+        "urgent" priority or a "01/02/2025" date from a CSV import, are copied to
+        tasks_unmapped (task id, field, original value) before their column is
+        set to NULL.
+        """
+        priority = "lower(trim(priority))"
+        day = "trim(due_date)"
+        # Round-tripping through julianday also rejects '2025-02-30', '123' and 'now'
+        is_date = f"coalesce(date(julianday({day})) = substr({day}, 1, 10), 0)"
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS tasks_unmapped (
+                task_id INTEGER NOT NULL,
+                field TEXT NOT NULL,
+                value TEXT NOT NULL
+            )
+        """)
+        cursor.execute(f"""
+            INSERT INTO tasks_unmapped (task_id, field, value)
+            SELECT id, 'priority', priority FROM tasks
+            WHERE coalesce({priority}, '') NOT IN ('', 'low', 'medium', 'high')
+        """)
+        cursor.execute(f"""
+            INSERT INTO tasks_unmapped (task_id, field, value)
+            SELECT id, 'due_date', due_date FROM tasks
+            WHERE coalesce({day}, '') != '' AND NOT {is_date}
+        """)
+        cursor.execute("""
+            CREATE TABLE tasks_typed (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                title TEXT NOT NULL,
+                description TEXT,
+                due_date INTEGER,
+                priority INTEGER CHECK (priority IN (0, 1, 2)),
+                completed INTEGER NOT NULL DEFAULT 0 CHECK (completed IN (0, 1)),
+                category TEXT
+            )
+        """)
+        cursor.execute(f"""
+            INSERT INTO tasks_typed (id, title, description, due_date, priority, completed, category)
+            SELECT id, title, description,
+                   CASE WHEN {is_date} THEN CAST(julianday(date({day})) + 0.5 AS INTEGER) END,
+                   CASE {priority} WHEN 'low' THEN 0 WHEN 'medium' THEN 1 WHEN 'high' THEN 2 END,
+                   CASE WHEN completed THEN 1 ELSE 0 END,
+                   category
+            FROM tasks
+        """)
+        # Dropping the table loses its AUTOINCREMENT counter; keep ids of deleted tasks retired
+        cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'tasks'")
+        row = cursor.fetchone()
+        cursor.execute("DROP TABLE tasks")
+        cursor.execute("ALTER TABLE tasks_typed RENAME TO tasks")
+        if row is not None:
+            cursor.execute("UPDATE sqlite_sequence SET seq = max(seq, ?) WHERE name = 'tasks'", row)
+        cursor.execute("CREATE INDEX idx_tasks_category ON tasks (category)")
+        cursor.execute("CREATE INDEX idx_tasks_due_date ON tasks (due_date)")
+        # Incomplete/completed tasks by due date, and tasks by priority then due date
+        cursor.execute("CREATE INDEX idx_tasks_completed_due_date ON tasks (completed, due_date)")
+        cursor.execute("CREATE INDEX idx_tasks_priority_due_date ON tasks (priority, due_date)")
+        # The triggers went with the old table; the FTS rowids did not change
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='tasks_fts'")
+        if cursor.fetchone() is not None:
+            self.create_fts_triggers(cursor)
+
+    def create_change_log(self, cursor):
+        """Log every insert, update and delete of a task, for watchers in other connections.
+
+        version is a counter over all writes, so a watcher only has to remember
+        the last version it saw. Old entries are pruned every 1000 changes.
+        """
+        cursor.execute("""
+            CREATE TABLE task_changes (
+                version INTEGER PRIMARY KEY AUTOINCREMENT,
+                task_id INTEGER NOT NULL,
+                op TEXT NOT NULL CHECK (op IN ('insert', 'update', 'delete'))
+            )
+        """)
+        self.create_change_log_triggers(cursor)
+        cursor.execute(f"""
+            CREATE TRIGGER task_changes_prune AFTER INSERT ON task_changes WHEN new.version % 1000 = 0 BEGIN
+                DELETE FROM task_changes WHERE version <= new.version - {self.CHANGE_LOG_SIZE};
+            END
+        """)
+
+    def create_change_log_triggers(self, cursor):
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS task_changes_insert AFTER INSERT ON tasks BEGIN
+                INSERT INTO task_changes (task_id, op) VALUES (new.id, 'insert');
+            END
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS task_changes_update AFTER UPDATE ON tasks BEGIN
+                INSERT INTO task_changes (task_id, op) VALUES (new.id, 'update');
+            END
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS task_changes_delete AFTER DELETE ON tasks BEGIN
+                INSERT INTO task_changes (task_id, op) VALUES (old.id, 'delete');
+            END
+        """)
+
+    def create_sort_indexes(self, cursor):
+        """Index the remaining SORT_COLUMNS so every header sort is an index scan.
+
+        The implicit rowid at the end of each index also serves the id
+        tie-breaker, and ORDER BY id under a priority or completed filter.
+        """
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_tasks_title ON tasks (title)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_tasks_priority ON tasks (priority)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_tasks_completed ON tasks (completed)")
+
+    def use_category_table(self, cursor):
+        """Move category names into a categories table referenced by tasks.category_id.
+
+        Category 0 is the empty name, used for tasks without a category, so every
+        task joins exactly one categories row. Names are trimmed on the way, which
+        merges categories that only differed in surrounding spaces.
+        """
+        cursor.execute("CREATE TABLE categories (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE)")
+        cursor.execute("INSERT INTO categories (id, name) VALUES (0, '')")
+        cursor.execute("INSERT OR IGNORE INTO categories (name)"
+                       " SELECT DISTINCT trim(category) FROM tasks WHERE category IS NOT NULL ORDER BY 1")
+        cursor.execute("""
+            CREATE TABLE tasks_normalized (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                title TEXT NOT NULL,
+                description TEXT,
+                due_date INTEGER,
+                priority INTEGER CHECK (priority IN (0, 1, 2)),
+                completed INTEGER NOT NULL DEFAULT 0 CHECK (completed IN (0, 1)),
+                category_id INTEGER NOT NULL DEFAULT 0 REFERENCES categories (id)
+            )
+        """)
+        cursor.execute("""
+            INSERT INTO tasks_normalized (id, title, description, due_date, priority, completed, category_id)
+            SELECT tasks.id, title, description, due_date, priority, completed, IFNULL(categories.id, 0)
+            FROM tasks LEFT JOIN categories ON categories.name = trim(tasks.category)
+        """)
+        # As in use_typed_columns: keep the AUTOINCREMENT counter across the rebuild
+        cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'tasks'")
+        row = cursor.fetchone()
+        cursor.execute("DROP TABLE tasks")
+        cursor.execute("ALTER TABLE tasks_normalized RENAME TO tasks")
+        if row is not None:
+            cursor.execute("UPDATE sqlite_sequence SET seq = max(seq, ?) WHERE name = 'tasks'", row)
+        cursor.execute("CREATE INDEX idx_tasks_category_id ON tasks (category_id)")
+        cursor.execute("CREATE INDEX idx_tasks_due_date ON tasks (due_date)")
+        cursor.execute("CREATE INDEX idx_tasks_completed_due_date ON tasks (completed, due_date)")
+        cursor.execute("CREATE INDEX idx_tasks_priority_due_date ON tasks (priority, due_date)")
+        cursor.execute("CREATE INDEX idx_tasks_title ON tasks (title)")
+        cursor.execute("CREATE INDEX idx_tasks_priority ON tasks (priority)")
+        cursor.execute("CREATE INDEX idx_tasks_completed ON tasks (completed)")
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='tasks_fts'")
+        if cursor.fetchone() is not None:
+            self.create_fts_triggers(cursor)
+        self.create_change_log_triggers(cursor)
+
+    def _category_ids(self, cursor, names):
+        """Return {name: category id} for the given (normalized) names, adding the new ones."""
+        names = list(set(names))
+        cursor.executemany("INSERT OR IGNORE INTO categories (name) VALUES (?)", [(name,) for name in names])
+        ids = {}
+        for start in range(0, len(names), 500):
+            chunk = names[start:start + 500]
+            cursor.execute("SELECT name, id FROM categories WHERE name IN (%s)" % ", ".join("?" * len(chunk)), chunk)
+            ids.update(cursor.fetchall())
+        return ids
+
+    @instrumented
+    def add_task(self, task):
+        cursor = self.conn.cursor()
+        # Convert (and so validate) the fields before the category insert opens the write transaction
+        values = (task.title, task.description, julian_day(task.due_date), priority_rank(task.priority),
+                  1 if task.completed else 0)
+        task.category = category_name(task.category)
+        category_id = self._category_ids(cursor, [task.category])[task.category]
+        cursor.execute(
+            "INSERT INTO tasks (title, description, due_date, priority, completed, category_id)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            values + (category_id,)
+        )
+        self.write_count += 1
+        self.commit()
+        task.id = cursor.lastrowid
+        return task.id
+
+    @instrumented
+    def add_many(self, rows):
+        """Insert (title, description, due_date, priority, completed, category) tuples with executemany.
+
+        Returns the number of rows inserted.
+        """
+        cursor = self.conn.cursor()
+        # Before _category_ids, as in add_task
+        rows = [(title, description, julian_day(due_date), priority_rank(priority), 1 if completed else 0,
+                 category_name(category)) for title, description, due_date, priority, completed, category in rows]
+        category_ids = self._category_ids(cursor, [row[5] for row in rows])
+        cursor.executemany(
+            "INSERT INTO tasks (title, description, due_date, priority, completed, category_id)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (row[:5] + (category_ids[row[5]],) for row in rows)
+        )
+        self.write_count += 1
+        self.commit()
+        return cursor.rowcount
+
+    @instrumented
+    def update_task(self, task):
+        cursor = self.conn.cursor()
+        # Before _category_ids, as in add_task
+        values = (task.title, task.description, julian_day(task.due_date), priority_rank(task.priority),
+                  1 if task.completed else 0)
+        task.category = category_name(task.category)
+        category_id = self._category_ids(cursor, [task.category])[task.category]
+        cursor.execute(
+            "UPDATE tasks SET title=?, description=?, due_date=?, priority=?, completed=?, category_id=? WHERE id=?",
+            values + (category_id, task.id)
+        )
+        self.write_count += 1
+        self.commit()
+
+    @instrumented
+    def delete_task(self, task_id):
+        cursor = self.conn.cursor()
+        cursor.execute("DELETE FROM tasks WHERE id=?", (task_id,))
+        self.write_count += 1
+        self.commit()
+
+    @instrumented
+    def update_many(self, tasks):
+        """Save several edited tasks in one transaction. Returns the number of rows updated."""
+        cursor = self.conn.cursor()
+        # Before _category_ids, as in add_task
+        rows = [(task.title, task.description, julian_day(task.due_date), priority_rank(task.priority),
+                 1 if task.completed else 0) for task in tasks]
+        for task in tasks:
+            task.category = category_name(task.category)
+        category_ids = self._category_ids(cursor, [task.category for task in tasks])
+        cursor.executemany(
+            "UPDATE tasks SET title=?, description=?, due_date=?, priority=?, completed=?, category_id=? WHERE id=?",
+            [row + (category_ids[task.category], task.id) for row, task in zip(rows, tasks)]
+        )
+        self.write_count += 1
+        self.commit()
+        return cursor.rowcount
+
+    @instrumented
+    def delete_where(self, keyword=None, priority=None, completed=None, category=None, ids=None):
+        """Delete every task matching the filters with a single statement.
+
+        Takes the same filters as query_tasks and returns the number of rows deleted.
+        """
+        from_where, params, _ = self._build_query(keyword, priority, completed, category, ids)
+        cursor = self.conn.cursor()
+        cursor.execute("DELETE FROM tasks WHERE id IN (SELECT tasks.id" + from_where + ")", params)
+        self.write_count += 1
+        self.commit()
+        return cursor.rowcount
+
+    @instrumented
+    def set_completed_where(self, value, keyword=None, priority=None, completed=None, category=None, ids=None):
+        """Set the completed flag of every task matching the filters with a single statement.
+
+        Rows that already have the flag are left alone. Returns the number of rows changed.
+        """
+        from_where, params, _ = self._build_query(keyword, priority, completed, category, ids)
+        cursor = self.conn.cursor()
+        cursor.execute(
+            "UPDATE tasks SET completed=? WHERE completed IS NOT ? AND id IN (SELECT tasks.id" + from_where + ")",
+            [1 if value else 0, 1 if value else 0] + params
+        )
+        self.write_count += 1
+        self.commit()
+        return cursor.rowcount
+
+    @instrumented
+    def data_version(self):
+        """Return a number that changes whenever tasks are written, by this connection or any other.
+
+        Results cached under one version are stale once it changes.
+        """
+        cursor = self.conn.cursor()
+        cursor.execute("PRAGMA data_version")
+        return self.write_count + cursor.fetchone()[0]
+
+    @instrumented
+    def change_version(self):
+        """Return the version of the newest entry in the change log (0 if there is none)."""
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT max(version) FROM task_changes")
+        return cursor.fetchone()[0] or 0
+
+    @instrumented
+    def changes_since(self, version, limit=1000):
+        """Return (latest version, [(task_id, op)]) for the tasks written after version.
+
+        Each task is listed once, with its last operation. Returns None when the
+        log no longer reaches back to version or holds more than limit entries
+        after it; the caller should reload everything instead.
+        """
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT min(version), max(version) FROM task_changes")
+        oldest, latest = cursor.fetchone()
+        if latest is None or latest <= version:
+            return version, []
+        if oldest > version + 1 or latest - version > limit:
+            return None
+        # The bare op column comes from the row holding max(version)
+        cursor.execute("SELECT task_id, op, max(version) FROM task_changes"
+                       " WHERE version > ? AND version <= ? GROUP BY task_id", (version, latest))
+        return latest, [(task_id, op) for task_id, op, _ in cursor.fetchall()]
+
+    @instrumented
+    def get_all_tasks(self):
+        cursor = self.conn.cursor()
+        cursor.row_factory = task_row_factory
+        cursor.execute("SELECT " + self.SELECT_COLUMNS + " FROM tasks CROSS JOIN categories"
+                       " ON categories.id = tasks.category_id")
+        return cursor.fetchall()
+
+    @instrumented
+    def categories(self):
+        """Return the sorted names of the categories that have tasks, without the empty one."""
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT name FROM categories WHERE id != 0"
+                       " AND EXISTS (SELECT 1 FROM tasks WHERE tasks.category_id = categories.id) ORDER BY name")
+        return [name for name, in cursor.fetchall()]
+
+    def _build_query(self, keyword=None, priority=None, completed=None, category=None, ids=None,
+                     extra_condition=None, sort=None, join_categories=False):
+        """Return a (from_where_clause, params, ranked) triple for the given filters.
+
+        ranked is True when the clause joins the FTS index, so results can be
+        ordered by bm25(). extra_condition is an optional (sql, params) pair
+        ANDed onto the filters. sort is the column the results will be ordered by.
+        join_categories adds the categories table, for reading category names.
+        """
+        tables = "tasks"
+        conditions = []
+        params = []
+        ranked = False
+        if keyword:
+            terms = re.findall(r"\w+", keyword)
+            if self.fts_enabled and terms:
+                # Prefix-match every word, e.g. 'meet notes' -> '"meet"* "notes"*'.
+                # CROSS JOIN keeps the FTS index as the outer loop; the other way
+                # round SQLite re-runs the MATCH for every row of the filtered tasks.
+                tables = "tasks_fts CROSS JOIN tasks ON tasks.id = tasks_fts.rowid"
+                conditions.append("tasks_fts MATCH ?")
+                params.append(" ".join(f'"{term}"*' for term in terms))
+                ranked = True
+            else:
+                # LIKE is case-insensitive for ASCII, matching the old lower() comparison
+                pattern = "%" + keyword.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+                conditions.append("(tasks.title LIKE ? ESCAPE '\\' OR tasks.description LIKE ? ESCAPE '\\')")
+                params.extend([pattern, pattern])
+        if priority:
+            conditions.append(self._filter_column("priority", sort) + " = ?")
+            params.append(priority_rank(priority))
+        if completed is not None:
+            conditions.append(self._filter_column("completed", sort) + " = ?")
+            params.append(1 if completed else 0)
+        if category is not None:
+            conditions.append("tasks.category_id = (SELECT id FROM categories WHERE name = ?)")
+            params.append(category_name(category))
+        if ids is not None:
+            conditions.append("tasks.id IN (%s)" % ", ".join("?" * len(ids)))
+            params.extend(ids)
+        if extra_condition is not None:
+            conditions.append(extra_condition[0])
+            params.extend(extra_condition[1])
+        if join_categories:
+            if sort == "category" and not ranked:
+                # Categories in name order as the outer loop, each one's tasks by id from
+                # idx_tasks_category_id inside it: rows come out sorted without a sort step
+                tables = "categories CROSS JOIN tasks ON tasks.category_id = categories.id"
+            else:
+                # CROSS JOIN keeps tasks outer, so its indexes still drive the scan
+                tables += " CROSS JOIN categories ON categories.id = tasks.category_id"
+        sql = " FROM " + tables
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        return sql, params, ranked
+
+    @staticmethod
+    def _filter_column(column, sort):
+        """Return the SQL for a priority/completed filter column under the given sort.
+
+        Their two or three values each match a large share of the rows, so when
+        no index covers (filter, sort) it is cheaper to walk the sort column's
+        index and skip non-matching rows than to sort every match for one page.
+        A unary + keeps SQLite from picking the filter column's index.
+        """
+        if sort in (None, "id", "due_date", column):
+            return "tasks." + column
+        return "+tasks." + column
+
+    def _select_sql(self, keyword=None, priority=None, completed=None, category=None, ids=None,
+                    sort=None, descending=False, limit=None, offset=0, extra_condition=None):
+        """Return the (sql, params) of a SELECT over all task columns for the given filters."""
+        from_where, params, ranked = self._build_query(keyword, priority, completed, category, ids,
+                                                       extra_condition, sort, join_categories=True)
+        sql = "SELECT " + self.SELECT_COLUMNS + from_where
+        if sort is not None:
+            direction = "DESC" if descending else "ASC"
+            sql += f" ORDER BY {self._sort_expression(sort)} {direction}, tasks.id {direction}"
+        elif ranked:
+            sql += " ORDER BY bm25(tasks_fts), tasks.id"
+        else:
+            sql += " ORDER BY tasks.id"
+        if limit is not None:
+            sql += " LIMIT ? OFFSET ?"
+            params.extend([limit, offset])
+        return sql, params
+
+    @instrumented
+    def query_tasks(self, keyword=None, priority=None, completed=None, category=None, ids=None,
+                    sort=None, descending=False, limit=None, offset=0, after=None):
+        """Return the tasks matching the given filters, filtered and sorted by SQLite.
+
+        keyword matches title or description, priority/category must match exactly,
+        completed is True, False or None (any), ids restricts the result to the given
+        task ids. sort is one of SORT_COLUMNS; without it keyword searches are ordered
+        by relevance, everything else by id.
+
+        after is a keyset cursor from keyset_position(): the page then starts right
+        after that task instead of skipping offset rows, so deep pages cost the same
+        as the first one.
+        """
+        cursor = self.conn.cursor()
+        cursor.row_factory = task_row_factory
+        if after is None:
+            sql, params = self._select_sql(keyword, priority, completed, category, ids, sort, descending,
+                                           limit, offset)
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+        tasks = []
+        for segment in self._keyset_segments(sort or "id", descending, after):
+            remaining = None if limit is None else limit - len(tasks)
+            if remaining == 0:
+                break
+            sql, params = self._select_sql(keyword, priority, completed, category, ids, sort or "id", descending,
+                                           remaining, extra_condition=segment)
+            cursor.execute(sql, params)
+            tasks.extend(cursor.fetchall())
+        return tasks
+
+    def _sort_expression(self, sort):
+        """Return the SQL that a SORT_COLUMNS name orders by."""
+        if sort not in self.SORT_COLUMNS:
+            raise ValueError(f"Cannot sort by {sort!r}")
+        if sort == "category":
+            return "categories.name"
+        return "tasks." + sort
+
+    @staticmethod
+    def keyset_position(task, sort=None):
+        """Return the (stored sort value, id) cursor for continuing a listing after task."""
+        if sort is None or sort == "id":
+            return None, task.id
+        if sort == "due_date":
+            value = julian_day(task.due_date)
+        elif sort == "priority":
+            value = priority_rank(task.priority)
+        elif sort == "completed":
+            value = 1 if task.completed else 0
+        else:
+            value = getattr(task, sort)
+        return value, task.id
+
+    def _keyset_segments(self, sort, descending, after):
+        """Return the (condition, params) pairs whose rows, in order, follow the cursor.
+
+        Each condition is a range on the sort column's index. SQLite sorts NULLs
+        first, so a nullable column needs a second segment for the NULL run (after
+        the others when descending, before them otherwise).
+        """
+        value, last_id = after
+        column = self._sort_expression(sort)
+        if sort == "id":
+            return [("tasks.id < ?" if descending else "tasks.id > ?", [last_id])]
+        if descending:
+            if value is None:
+                return [(f"{column} IS NULL AND tasks.id < ?", [last_id])]
+            return [(f"{column} <= ? AND ({column} < ? OR tasks.id < ?)", [value, value, last_id]),
+                    (f"{column} IS NULL", [])]
+        if value is None:
+            return [(f"{column} IS NULL AND tasks.id > ?", [last_id]), (f"{column} IS NOT NULL", [])]
+        return [(f"{column} >= ? AND ({column} > ? OR tasks.id > ?)", [value, value, last_id])]
+
+    @instrumented_batches
+    def iter_batches(self, batch_size=1000, **filters):
+        """Yield the matching rows as TaskBatch blocks of up to batch_size rows.
+
+        Takes the query_tasks filters and sort arguments, and pulls rows from the
+        cursor with fetchmany so memory use does not grow with the result size.
+        """
+        sql, params = self._select_sql(**filters)
+        cursor = self.conn.cursor()
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield TaskBatch(rows)
+
+    @instrumented
+    def count_tasks(self, keyword=None, priority=None, completed=None, category=None, ids=None):
+        """Return the number of tasks matching the given filters."""
+        from_where, params, _ = self._build_query(keyword, priority, completed, category, ids)
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT COUNT(*)" + from_where, params)
+        return cursor.fetchone()[0]
+
+    @instrumented
+    def task_stats(self, today=None, weeks=8):
+        """Return dashboard counts as a dict, computed by aggregate queries.
+
+        Every query is answered from a covering index, so none reads the table
+        itself. today is a "yyyy-MM-dd" string (default: the current date).
+        completion_by_week holds (monday, due, completed) for the tasks due in
+        each of the last weeks weeks, oldest first.
+        """
+        today = date.fromisoformat(today) if today else date.today()
+        today_day = julian_day(today.isoformat())
+        cursor = self.conn.cursor()
+
+        cursor.execute("SELECT completed, COUNT(*) FROM tasks GROUP BY completed")
+        by_status = dict(cursor.fetchall())
+        cursor.execute("SELECT priority, COUNT(*) FROM tasks GROUP BY priority")
+        by_priority = {None if rank is None else PRIORITIES[rank]: count for rank, count in cursor.fetchall()}
+        cursor.execute("SELECT categories.name, counts.count FROM categories CROSS JOIN"
+                       " (SELECT category_id, COUNT(*) AS count FROM tasks GROUP BY category_id) AS counts"
+                       " ON categories.id = counts.category_id ORDER BY 2 DESC")
+        by_category = dict(cursor.fetchall())
+
+        # Incomplete tasks by due date, from idx_tasks_completed_due_date
+        cursor.execute("SELECT COUNT(*) FROM tasks WHERE completed = 0 AND due_date < ?", (today_day,))
+        overdue = cursor.fetchone()[0]
+        cursor.execute("SELECT COUNT(*) FROM tasks WHERE completed = 0 AND due_date = ?", (today_day,))
+        due_today = cursor.fetchone()[0]
+        cursor.execute("SELECT COUNT(*) FROM tasks WHERE completed = 0 AND due_date BETWEEN ? AND ?",
+                       (today_day, today_day + 6))
+        due_this_week = cursor.fetchone()[0]
+
+        monday = today - timedelta(days=today.weekday())
+        first_monday = monday - timedelta(weeks=weeks - 1)
+        start = julian_day(first_monday.isoformat())
+        # Two queries, so each stays within one index instead of reading completed from the table
+        window = (start, start, start + 7 * weeks)
+        cursor.execute("SELECT (due_date - ?) / 7, COUNT(*) FROM tasks"
+                       " WHERE due_date >= ? AND due_date < ? GROUP BY 1", window)
+        due_per_week = dict(cursor.fetchall())
+        cursor.execute("SELECT (due_date - ?) / 7, COUNT(*) FROM tasks"
+                       " WHERE completed = 1 AND due_date >= ? AND due_date < ? GROUP BY 1", window)
+        completed_per_week = dict(cursor.fetchall())
+        completion_by_week = [((first_monday + timedelta(weeks=week)).isoformat(), due_per_week.get(week, 0),
+                               completed_per_week.get(week, 0)) for week in range(weeks)]
+
+        return {
+            "total": sum(by_status.values()),
+            "completed": by_status.get(1, 0),
+            "incomplete": by_status.get(0, 0),
+            "overdue": overdue,
+            "due_today": due_today,
+            "due_this_week": due_this_week,
+            "by_priority": by_priority,
+            "by_category": by_category,
+            "completion_by_week": completion_by_week,
+        }
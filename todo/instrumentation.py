@@ -0,0 +1,239 @@
+"""Opt-in timing and SQLite counters for finding out where time goes.
+
+Off unless the TODO_PROFILE environment variable is set (to anything but
+"0") or recorder.enabled is switched on at runtime, e.g. from the GUI's
+Debug menu. While off, instrumented calls cost one attribute check.
+
+    TODO_PROFILE=1 python -m todo list --search report   # summary on stderr
+
+recorder collects a latency histogram per name ("db.query_tasks",
+"model.reload", ...), counters for SQLite statements and rows fetched, and
+can capture a cProfile of several threads at once. The profiling and JSON
+modules are imported on first use, to keep them out of the GUI's start-up.
+"""
+import functools
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Upper bounds of the histogram buckets in milliseconds: 0.05 ms doubling up to ~52 s
+BUCKET_BOUNDS_MS = [0.05 * 2 ** power for power in range(21)]
+
+
+class Histogram:
+    """Counts of durations in power-of-two buckets, plus exact count/total/min/max."""
+    __slots__ = ("buckets", "count", "total_ms", "min_ms", "max_ms")
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKET_BOUNDS_MS) + 1)  # The last one catches everything slower
+        self.count = 0
+        self.total_ms = 0.0
+        self.min_ms = None
+        self.max_ms = 0.0
+
+    def add(self, ms):
+        self.buckets[bisect_left(BUCKET_BOUNDS_MS, ms)] += 1
+        self.count += 1
+        self.total_ms += ms
+        self.min_ms = ms if self.min_ms is None else min(self.min_ms, ms)
+        self.max_ms = max(self.max_ms, ms)
+
+    def percentile(self, fraction):
+        """Estimate a percentile as the upper bound of the bucket it falls in."""
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= fraction * self.count:
+                return min(BUCKET_BOUNDS_MS[index], self.max_ms) if index < len(BUCKET_BOUNDS_MS) else self.max_ms
+        return 0.0
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "total_ms": round(self.total_ms, 3),
+            "mean_ms": round(self.total_ms / self.count, 3) if self.count else 0.0,
+            "min_ms": round(self.min_ms or 0.0, 3),
+            "max_ms": round(self.max_ms, 3),
+            "p50_ms": round(self.percentile(0.5), 3),
+            "p95_ms": round(self.percentile(0.95), 3),
+            "p99_ms": round(self.percentile(0.99), 3),
+            "buckets": {f"<={bound:g}ms": count for bound, count in zip(BUCKET_BOUNDS_MS, self.buckets) if count},
+        }
+
+
+class Recorder:
+    """Thread-safe store of histograms and counters, shared by the GUI and database threads."""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.timings = {}  # Name -> Histogram
+        self.counters = {}  # Name -> int
+        self.profiles = None  # Thread id -> cProfile.Profile while a capture is running
+
+    def record(self, name, ms):
+        """Add a duration in milliseconds to the named histogram."""
+        if not self.enabled:
+            return
+        with self.lock:
+            histogram = self.timings.get(name)
+            if histogram is None:
+                histogram = self.timings[name] = Histogram()
+            histogram.add(ms)
+
+    def record_since(self, name, start):
+        """Record the time since start, a time.perf_counter() value."""
+        if self.enabled:
+            self.record(name, (time.perf_counter() - start) * 1000)
+
+    @contextmanager
+    def timed(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_since(name, start)
+
+    def count(self, name, amount=1):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def trace_statement(self, statement):
+        """sqlite3 trace callback; statements run by triggers arrive as "-- TRIGGER ..." comments."""
+        if self.enabled:
+            self.count("sqlite.trigger_statements" if statement.startswith("--") else "sqlite.statements")
+
+    def reset(self):
+        with self.lock:
+            self.timings = {}
+            self.counters = {}
+
+    def snapshot(self):
+        """Return everything recorded so far as a JSON-serializable dict."""
+        with self.lock:
+            return {
+                "enabled": self.enabled,
+                "timings": {name: histogram.to_dict() for name, histogram in sorted(self.timings.items())},
+                "counters": dict(sorted(self.counters.items())),
+            }
+
+    def dump(self, filename):
+        import json
+
+        with open(filename, "w", encoding="utf-8") as file:
+            json.dump(self.snapshot(), file, indent=2)
+
+    def report(self):
+        """Return a plain-text table of the timings and counters."""
+        snapshot = self.snapshot()
+        lines = [f"{'name':<32} {'count':>7} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9}"]
+        for name, timing in snapshot["timings"].items():
+            lines.append(f"{name:<32} {timing['count']:>7} {timing['mean_ms']:>9.2f} {timing['p50_ms']:>9.2f} "
+                         f"{timing['p95_ms']:>9.2f} {timing['max_ms']:>9.2f}")
+        if snapshot["counters"]:
+            lines.append("")
+            lines.extend(f"{name:<32} {value:>7}" for name, value in snapshot["counters"].items())
+        return "\n".join(lines)
+
+    # cProfile only sees the thread that enabled it, so a capture holds one profile per thread. Threads
+    # started outside Python (a QThread) also lose it between calls into Python, so they resume and
+    # pause their profile around each unit of work.
+
+    @property
+    def profiling(self):
+        return self.profiles is not None
+
+    def start_profile(self):
+        """Begin a capture; each thread to include then calls profile_thread()."""
+        with self.lock:
+            self.profiles = {}
+
+    def profile_thread(self):
+        """Start or resume profiling the calling thread, if a capture is running."""
+        import cProfile
+
+        with self.lock:
+            if self.profiles is None:
+                return
+            profile = self.profiles.get(threading.get_ident())
+            if profile is None:
+                profile = self.profiles[threading.get_ident()] = cProfile.Profile()
+        profile.enable()
+
+    def stop_profile_thread(self):
+        """Pause profiling the calling thread."""
+        with self.lock:
+            profile = None if self.profiles is None else self.profiles.get(threading.get_ident())
+        if profile is not None:
+            profile.disable()
+
+    def finish_profile(self, filename=None, limit=30):
+        """End the capture: optionally save the merged stats for pstats/snakeviz, return the top entries as text."""
+        with self.lock:
+            profiles, self.profiles = list((self.profiles or {}).values()), None
+        if not profiles:
+            return ""
+        import io
+        import pstats
+
+        stream = io.StringIO()
+        stats = pstats.Stats(profiles[0], stream=stream)
+        for profile in profiles[1:]:
+            stats.add(profile)
+        if filename:
+            stats.dump_stats(filename)
+        stats.sort_stats("cumulative").print_stats(limit)
+        return stream.getvalue()
+
+
+recorder = Recorder(enabled=os.environ.get("TODO_PROFILE", "0") not in ("", "0"))
+
+
+def instrumented(method):
+    """Time a TaskDatabase method under "db.<name>" and count the rows it returns.
+
+    The first call on a connection while recording also attaches the
+    statement counter; it has to happen on the connection's own thread.
+    """
+    name = "db." + method.__name__
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if not recorder.enabled:
+            return method(self, *args, **kwargs)
+        if not self.traced:
+            self.conn.set_trace_callback(recorder.trace_statement)
+            self.traced = True
+        start = time.perf_counter()
+        result = method(self, *args, **kwargs)
+        recorder.record_since(name, start)
+        if isinstance(result, list):
+            recorder.count("rows." + method.__name__, len(result))
+        return result
+
+    return wrapper
+
+
+def instrumented_batches(method):
+    """Like instrumented, for iter_batches: times the whole iteration and counts the rows yielded."""
+    name = "db." + method.__name__
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if not recorder.enabled:
+            yield from method(self, *args, **kwargs)
+            return
+        if not self.traced:
+            self.conn.set_trace_callback(recorder.trace_statement)
+            self.traced = True
+        start = time.perf_counter()
+        for batch in method(self, *args, **kwargs):
+            recorder.count("rows." + method.__name__, len(batch))
+            yield batch
+        recorder.record_since(name, start)
+
+    return wrapper
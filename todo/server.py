@@ -0,0 +1,394 @@
+"""Local HTTP/JSON service over TaskDatabase: `python -m todo serve`.
+
+Reads run on a pool of threads, each with its own read-only connection, so
+they proceed in parallel under WAL. Every write goes through one writer
+connection on a thread of its own, so writes are serialized instead of
+competing for the lock. Listings use keyset pagination, and responses carry
+an ETag derived from PRAGMA data_version so unchanged data is answered with
+304 Not Modified without running the query.
+
+Endpoints (JSON in and out):
+    GET    /version              current data version
+    GET    /stats                dashboard counts (TaskDatabase.task_stats)
+    GET    /tasks                ?search= &priority= &status=completed|incomplete
+                                 &category= &sort= &desc=1 &limit= &after=<next>
+    POST   /tasks                create a task, returns it with its id
+    GET    /tasks/<id>
+    PATCH  /tasks/<id>           change some fields
+    DELETE /tasks/<id>
+    POST   /tasks/bulk           {"action": "add", "tasks": [...]} or
+                                 {"action": "delete"|"complete"|"uncomplete",
+                                  "ids": [...]} / "filter": {...}; a filter
+                                 matching everything also needs "all": true
+"""
+import asyncio
+import base64
+import json
+import sqlite3
+import sys
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+from todo.database import TaskDatabase
+from todo.tasks import PRIORITIES, Task, julian_day
+
+TASK_FIELDS = ("title", "description", "due_date", "priority", "completed", "category")
+FILTER_KEYS = ("search", "priority", "status", "category")  # Of GET /tasks and bulk filters
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+MAX_BODY_SIZE = 16 * 1024 * 1024
+
+
+class HTTPError(Exception):
+    """Turned into an error response with a {"error": message} body."""
+
+    def __init__(self, status, message):
+        super(HTTPError, self).__init__(message)
+        self.status = status
+
+
+def task_to_json(task):
+    return {"id": task.id, "title": task.title, "description": task.description, "due_date": task.due_date,
+            "priority": task.priority, "completed": task.completed, "category": task.category}
+
+
+def task_fields(data, partial=False):
+    """Validate the task fields of a request body; partial allows any subset of them."""
+    if not isinstance(data, dict):
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "expected a JSON object")
+    unknown = set(data) - set(TASK_FIELDS) - {"id"}
+    if unknown:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"unknown fields: {', '.join(sorted(unknown))}")
+    if not partial or "title" in data:
+        title = data.get("title")
+        if not isinstance(title, str) or not title.strip():
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "title is required")
+    fields = {field: data[field] for field in TASK_FIELDS if field in data}
+    for field in ("title", "description", "category"):
+        if field in fields and not isinstance(fields[field], str):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"{field} must be a string")
+    for field in ("due_date", "priority"):  # null or "" for none
+        if fields.get(field) is not None and not isinstance(fields[field], str):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"{field} must be a string or null")
+    if fields.get("due_date"):
+        try:
+            julian_day(fields["due_date"])
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "due_date must be a yyyy-mm-dd date")
+    if fields.get("priority") and fields["priority"] not in PRIORITIES:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"priority must be one of {', '.join(PRIORITIES)}")
+    if "completed" in fields and not isinstance(fields["completed"], bool):
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "completed must be true or false")
+    return fields
+
+
+def encode_cursor(sort, descending, position):
+    raw = json.dumps([sort, descending, position[0], position[1]]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor, sort, descending):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_sort, cursor_descending, value, last_id = json.loads(raw)
+    except (ValueError, TypeError):
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "malformed cursor")
+    if cursor_sort != sort or cursor_descending != descending:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "cursor belongs to a different sort order")
+    return value, last_id
+
+
+def filters_from_query(query):
+    """Return query_tasks filters from a parsed query string (CLI option names)."""
+    status = query.get("status")
+    if status not in (None, "completed", "incomplete"):
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "status must be completed or incomplete")
+    return {
+        "keyword": query.get("search"),
+        "priority": query.get("priority"),
+        "completed": None if status is None else status == "completed",
+        "category": query.get("category"),
+    }
+
+
+def bulk_filters(data):
+    """Return query_tasks filters from a bulk request's "filter" object.
+
+    Unknown keys are rejected rather than ignored, since a misspelled one
+    would widen the filter, and a filter that matches every task needs an
+    explicit "all": true.
+    """
+    query = data.get("filter", {})
+    if not isinstance(query, dict):
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "filter must be a JSON object")
+    unknown = set(query) - set(FILTER_KEYS)
+    if unknown:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"unknown filter keys: {', '.join(sorted(unknown))}")
+    if not all(value is None or isinstance(value, str) for value in query.values()):
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "filter values must be strings")
+    filters = filters_from_query(query)
+    if all(value in (None, "") for value in filters.values()) and data.get("all") is not True:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, 'the filter matches every task; add "all": true to mean that')
+    return filters
+
+
+class TaskService:
+    """Routes requests to a pool of reader connections and a single writer connection."""
+
+    def __init__(self, db_file="tasks.db", readers=4):
+        self.db_file = db_file
+        self.local = threading.local()
+        self.reader_pool = ThreadPoolExecutor(max_workers=readers, thread_name_prefix="todo-reader")
+        self.writer_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="todo-writer")
+        # Opened first so it runs any pending migration before the readers connect
+        self.writer_pool.submit(self.connection).result()
+        # Used from the event loop only, for the cheap PRAGMA data_version
+        self.version_db = TaskDatabase(db_file)
+        self.instance = uuid.uuid4().hex[:8]  # Versions of different server runs must not collide
+
+    def connection(self):
+        """Return this pool thread's own TaskDatabase, opening it on first use."""
+        db = getattr(self.local, "db", None)
+        if db is None:
+            db = TaskDatabase(self.db_file)
+            if threading.current_thread().name.startswith("todo-reader"):
+                db.apply_pragmas({"query_only": 1})
+            self.local.db = db
+        return db
+
+    async def read(self, function):
+        """Run function(db) on a reader connection."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.reader_pool, lambda: function(self.connection()))
+
+    async def write(self, function):
+        """Run function(db) on the writer connection, one write at a time."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.writer_pool, lambda: function(self.connection()))
+
+    def etag(self, variant=""):
+        return f'W/"{self.instance}-{self.version_db.data_version()}{variant}"'
+
+    def close(self):
+        for pool in (self.reader_pool, self.writer_pool):
+            pool.shutdown(wait=True)
+        self.version_db.conn.close()
+
+    # Routing
+
+    async def dispatch(self, method, target, headers, body):
+        """Return (status, JSON payload or None, extra headers) for one request."""
+        url = urlsplit(target)
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        parts = [part for part in url.path.split("/") if part]
+        data = None
+        if body:
+            try:
+                data = json.loads(body)
+            except ValueError:
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "malformed JSON body")
+
+        if parts == ["version"] and method == "GET":
+            etag = self.etag()
+            return HTTPStatus.OK, {"version": etag}, {"ETag": etag}
+        if parts == ["stats"] and method == "GET":
+            # Overdue and due counts also change with the date
+            return await self.conditional(headers, lambda etag: self.read(lambda db: db.task_stats()),
+                                          variant="-" + date.today().isoformat())
+        if parts == ["tasks"] and method == "GET":
+            return await self.conditional(headers, lambda etag: self.list_tasks(query, etag))
+        if parts == ["tasks"] and method == "POST":
+            return HTTPStatus.CREATED, await self.create_task(task_fields(data)), {}
+        if parts == ["tasks", "bulk"] and method == "POST":
+            return HTTPStatus.OK, await self.bulk(data), {}
+        if len(parts) == 2 and parts[0] == "tasks":
+            try:
+                task_id = int(parts[1])
+            except ValueError:
+                raise HTTPError(HTTPStatus.NOT_FOUND, "no such task")
+            if method == "GET":
+                return await self.conditional(headers, lambda etag: self.get_task(task_id))
+            if method == "PATCH":
+                return HTTPStatus.OK, await self.patch_task(task_id, task_fields(data, partial=True)), {}
+            if method == "DELETE":
+                await self.delete_task(task_id)
+                return HTTPStatus.NO_CONTENT, None, {}
+            raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, f"{method} not allowed here")
+        raise HTTPError(HTTPStatus.NOT_FOUND, f"no route for {method} {url.path}")
+
+    async def conditional(self, headers, handler, variant=""):
+        """Answer 304 when the client's ETag is current, else run handler(etag).
+
+        The version is read before the query, so a write racing with it can
+        only make the ETag older than the data, never newer.
+        """
+        etag = self.etag(variant)
+        if headers.get("if-none-match") == etag:
+            return HTTPStatus.NOT_MODIFIED, None, {"ETag": etag}
+        return HTTPStatus.OK, await handler(etag), {"ETag": etag}
+
+    # Handlers
+
+    async def list_tasks(self, query, etag):
+        filters = filters_from_query(query)
+        sort = query.get("sort", "id")
+        if sort not in TaskDatabase.SORT_COLUMNS:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"cannot sort by {sort!r}")
+        descending = query.get("desc", "0") not in ("0", "false", "")
+        try:
+            limit = min(int(query.get("limit", DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE)
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "limit must be a number")
+        if limit < 1:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "limit must be positive")
+        after = decode_cursor(query["after"], sort, descending) if "after" in query else None
+        tasks = await self.read(lambda db: db.query_tasks(sort=sort, descending=descending, limit=limit,
+                                                          after=after, **filters))
+        cursor = None
+        if len(tasks) == limit:
+            cursor = encode_cursor(sort, descending, TaskDatabase.keyset_position(tasks[-1], sort))
+        return {"tasks": [task_to_json(task) for task in tasks], "next": cursor, "version": etag}
+
+    async def get_task(self, task_id):
+        tasks = await self.read(lambda db: db.query_tasks(ids=[task_id]))
+        if not tasks:
+            raise HTTPError(HTTPStatus.NOT_FOUND, "no such task")
+        return task_to_json(tasks[0])
+
+    async def create_task(self, fields):
+        task = Task(None, fields["title"], fields.get("description", ""), fields.get("due_date"),
+                    fields.get("priority"), fields.get("completed", False), fields.get("category", ""))
+        await self.write(lambda db: db.add_task(task))
+        return task_to_json(task)
+
+    async def patch_task(self, task_id, fields):
+        def patch(db):
+            with db.transaction(immediate=True):
+                tasks = db.query_tasks(ids=[task_id])
+                if not tasks:
+                    return None
+                for field, value in fields.items():
+                    setattr(tasks[0], field, value)
+                db.update_task(tasks[0])
+            return tasks[0]
+
+        task = await self.write(patch)
+        if task is None:
+            raise HTTPError(HTTPStatus.NOT_FOUND, "no such task")
+        return task_to_json(task)
+
+    async def delete_task(self, task_id):
+        if not await self.write(lambda db: db.delete_where(ids=[task_id])):
+            raise HTTPError(HTTPStatus.NOT_FOUND, "no such task")
+
+    async def bulk(self, data):
+        if not isinstance(data, dict):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "expected a JSON object")
+        action = data.get("action")
+        if action == "add":
+            tasks = data.get("tasks")
+            if not isinstance(tasks, list):
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "tasks must be a list")
+            rows = []
+            for item in tasks:
+                fields = task_fields(item)
+                rows.append((fields["title"], fields.get("description", ""), fields.get("due_date"),
+                             fields.get("priority"), fields.get("completed", False), fields.get("category", "")))
+
+            def add(db):
+                with db.transaction():
+                    return db.add_many(rows)
+
+            return {"added": await self.write(add)}
+        if action not in ("delete", "complete", "uncomplete"):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "action must be add, delete, complete or uncomplete")
+        if "ids" in data:
+            ids = data["ids"]
+            if not isinstance(ids, list) or not all(type(task_id) is int for task_id in ids):  # Not bool
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "ids must be a list of task ids")
+            filters = {"ids": ids}
+        elif "filter" in data or "all" in data:
+            filters = bulk_filters(data)
+        else:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "give the tasks as ids or filter")
+        if action == "delete":
+            changed = await self.write(lambda db: db.delete_where(**filters))
+        else:
+            changed = await self.write(lambda db: db.set_completed_where(action == "complete", **filters))
+        return {"changed": changed}
+
+    # HTTP/1.1 with keep-alive, just enough for local clients
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, target, version = request_line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0))
+                if length > MAX_BODY_SIZE:
+                    break
+                body = await reader.readexactly(length) if length else b""
+                status, payload, extra_headers = await self.respond(method, target, headers, body)
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection == "keep-alive" or (version == "HTTP/1.1" and connection != "close")
+                writer.write(self.encode_response(status, payload, extra_headers, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, method, target, headers, body):
+        try:
+            return await self.dispatch(method, target, headers, body)
+        except HTTPError as e:
+            return e.status, {"error": str(e)}, {}
+        except (ValueError, sqlite3.IntegrityError) as e:
+            return HTTPStatus.BAD_REQUEST, {"error": str(e)}, {}
+        except Exception as e:
+            print(f"todo serve: {method} {target} failed: {e!r}", file=sys.stderr)
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {"error": "internal error"}, {}
+
+    @staticmethod
+    def encode_response(status, payload, extra_headers, keep_alive):
+        body = b"" if payload is None else json.dumps(payload).encode()
+        lines = [f"HTTP/1.1 {status.value} {status.phrase}",
+                 f"Content-Length: {len(body)}",
+                 "Connection: " + ("keep-alive" if keep_alive else "close")]
+        if payload is not None:
+            lines.append("Content-Type: application/json")
+        lines.extend(f"{name}: {value}" for name, value in extra_headers.items())
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body
+
+
+async def run_server(service, host, port):
+    server = await asyncio.start_server(service.handle_connection, host, port)
+    print(f"Serving {service.db_file} on http://{host}:{port}", file=sys.stderr)
+    async with server:
+        await server.serve_forever()
+
+
+def serve(db_file="tasks.db", host="127.0.0.1", port=8765, readers=4):
+    """Serve the task store until interrupted."""
+    service = TaskService(db_file, readers)
+    try:
+        asyncio.run(run_server(service, host, port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
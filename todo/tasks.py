@@ -0,0 +1,74 @@
+"""Task records and the conversions between their fields and the stored column values."""
+from array import array
+from datetime import date
+
+PRIORITIES = ("Low", "Medium", "High")  # Stored as their index, so they sort by rank
+JULIAN_DAY_OFFSET = 1721425  # date.toordinal() + this = Julian day number, as SQLite's date() reads it
+
+
+def priority_rank(priority):
+    """Map "Low"/"Medium"/"High" to the stored 0/1/2 (None for no priority)."""
+    if not priority:
+        return None
+    if priority not in PRIORITIES:
+        raise ValueError(f"unknown priority {priority!r}")
+    return PRIORITIES.index(priority)
+
+
+def julian_day(due_date):
+    """Map a "yyyy-MM-dd" string to the stored Julian day number (None for no date)."""
+    if not due_date:
+        return None
+    return date.fromisoformat(due_date).toordinal() + JULIAN_DAY_OFFSET
+
+
+def category_name(category):
+    """Normalize a category as stored in the categories table ("" for no category)."""
+    return (category or "").strip()
+
+
+class Task:
+    # No per-instance __dict__; a large result set holds one of these per row
+    __slots__ = ("id", "title", "description", "due_date", "priority", "completed", "category")
+
+    def __init__(self, id, title, description, due_date, priority, completed, category):
+        self.id = id  # Database ID (None if not yet saved)
+        self.title = title
+        self.description = description
+        self.due_date = due_date  # A string "yyyy-MM-dd" (a Julian day number in the database)
+        self.priority = priority  # "Low", "Medium", or "High" (0, 1 or 2 in the database)
+        self.completed = completed  # Boolean
+        self.category = category  # Category name, "" for none (a categories row in the database)
+
+
+def task_row_factory(cursor, row):
+    """sqlite3 row factory building a Task from an (id, title, ..., category) row."""
+    return Task(row[0], row[1], row[2], row[3], row[4], bool(row[5]), row[6])
+
+
+class TaskBatch:
+    """A read-only, column-oriented block of task rows for bulk paths such as export.
+
+    Each field is one tuple (or a compact array for id/completed) instead of a
+    Task object per row.
+    """
+    __slots__ = ("ids", "titles", "descriptions", "due_dates", "priorities", "completed", "categories")
+
+    def __init__(self, rows):
+        columns = list(zip(*rows)) or [()] * 7
+        self.ids = array("q", columns[0])
+        self.titles = columns[1]
+        self.descriptions = columns[2]
+        self.due_dates = columns[3]
+        self.priorities = columns[4]
+        self.completed = array("b", columns[5])
+        self.categories = columns[6]
+
+    def __len__(self):
+        return len(self.ids)
+
+    def tasks(self):
+        """Yield the rows as Task objects."""
+        for row in zip(self.ids, self.titles, self.descriptions, self.due_dates, self.priorities,
+                       self.completed, self.categories):
+            yield task_row_factory(None, row)
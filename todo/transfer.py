@@ -0,0 +1,148 @@
+"""Streaming CSV import and CSV/JSON Lines export, shared by the GUI and the CLI."""
+import csv
+import gzip
+import json
+import os
+import sys
+from contextlib import nullcontext
+
+from todo.tasks import PRIORITIES, julian_day
+
+CSV_HEADER = ["Title", "Description", "Due Date", "Priority", "Completed", "Category"]
+
+
+class Cancelled(Exception):
+    """Raised when the caller's cancelled() check returns True.
+
+    imported is the number of tasks an import had already committed; they are kept.
+    """
+
+    def __init__(self, imported=0):
+        super(Cancelled, self).__init__(imported)
+        self.imported = imported
+
+
+def parse_csv_row(row):
+    """Turn a CSV row into an add_many tuple, or raise ValueError saying why it was skipped."""
+    if len(row) < 6:
+        raise ValueError(f"expected 6 columns, got {len(row)}")
+    title, description, due_date, priority, completed_str, category = row[:6]
+    if not title.strip():
+        raise ValueError("missing title")
+    priority = priority.strip()
+    if priority and priority.capitalize() not in PRIORITIES:  # Any case, as the typed-columns migration maps
+        raise ValueError(f"unknown priority {priority!r}")
+    try:
+        julian_day(due_date.strip())
+    except ValueError:
+        raise ValueError(f"invalid due date {due_date.strip()!r}")
+    completed = 1 if completed_str.strip().lower() in ["yes", "true", "1"] else 0
+    return (title.strip(), description.strip(), due_date.strip(), priority.capitalize(), completed, category.strip())
+
+
+def import_csv(db, filename, batch_size=5000, max_errors=20, progress=None, cancelled=None):
+    """Stream a CSV file into the database, committing one transaction per batch.
+
+    Committing in batches holds the write lock for one batch at a time, so the
+    GUI, the server and the CLI can still write while a large file imports.
+    progress(percent of the file read) is called after every batch, and
+    cancelled() is checked before it; returning True raises Cancelled, keeping
+    the batches already committed. Returns (imported, skipped, errors) where
+    errors holds the (line, reason) of the first max_errors skipped rows.
+    """
+    file_size = os.path.getsize(filename) or 1
+    with open(filename, mode='r', newline='', encoding='utf-8') as file:
+        chars_read = 0
+
+        def lines():
+            nonlocal chars_read
+            for line in file:
+                chars_read += len(line)
+                yield line
+
+        reader = csv.reader(lines())
+        next(reader, None)  # Skip header row if present
+        imported = 0
+        skipped = 0
+        errors = []
+        batch = []
+        for row in reader:
+            try:
+                batch.append(parse_csv_row(row))
+            except ValueError as e:
+                skipped += 1
+                if len(errors) < max_errors:
+                    errors.append((reader.line_num, str(e)))
+            if len(batch) >= batch_size:
+                if cancelled is not None and cancelled():
+                    raise Cancelled(imported)
+                with db.transaction():
+                    imported += db.add_many(batch)
+                batch = []
+                if progress is not None:
+                    progress(min(99, chars_read * 100 // file_size))
+        if cancelled is not None and cancelled():
+            raise Cancelled(imported)
+        if batch:
+            with db.transaction():
+                imported += db.add_many(batch)
+    return imported, skipped, errors
+
+
+def open_output(filename):
+    """Open an export target for writing text; "-" is stdout and a .gz suffix compresses."""
+    if filename == "-":
+        return nullcontext(sys.stdout)
+    if filename.endswith(".gz"):
+        return gzip.open(filename, mode='wt', newline='', encoding='utf-8')
+    return open(filename, mode='w', newline='', encoding='utf-8')
+
+
+def export_tasks(db, filename, filters=None, file_format=None, batch_size=5000, progress=None, cancelled=None):
+    """Stream the tasks matching filters to a CSV or JSON Lines file.
+
+    filters are query_tasks keyword arguments, including the sort. file_format
+    is "csv" or "jsonl"; by default *.jsonl(.gz) files get JSON Lines and
+    everything else CSV. Rows come from the cursor in batches, so memory use
+    stays flat. progress(percent written) is called after every batch; when
+    cancelled() returns True the partial file is removed and Cancelled raised.
+    Returns the number of tasks written.
+    """
+    filters = filters or {}
+    count_filters = {key: value for key, value in filters.items() if key not in ("sort", "descending")}
+    total = db.count_tasks(**count_filters) or 1
+    if file_format is None:
+        file_format = "jsonl" if filename.endswith((".jsonl", ".jsonl.gz")) else "csv"
+    written = 0
+    with open_output(filename) as file:
+        if file_format == "csv":
+            writer = csv.writer(file)
+            # Write header row
+            writer.writerow(CSV_HEADER)
+        for batch in db.iter_batches(batch_size=batch_size, **filters):
+            if cancelled is not None and cancelled():
+                break
+            if file_format == "jsonl":
+                for title, description, due_date, priority, completed, category in zip(
+                        batch.titles, batch.descriptions, batch.due_dates, batch.priorities,
+                        batch.completed, batch.categories):
+                    file.write(json.dumps({
+                        "title": title,
+                        "description": description,
+                        "due_date": due_date,
+                        "priority": priority,
+                        "completed": bool(completed),
+                        "category": category
+                    }) + "\n")
+            else:
+                writer.writerows(zip(batch.titles, batch.descriptions, batch.due_dates, batch.priorities,
+                                     ["Yes" if completed else "No" for completed in batch.completed],
+                                     batch.categories))
+            written += len(batch)
+            if progress is not None:
+                progress(min(99, written * 100 // total))
+    if cancelled is not None and cancelled():
+        if filename != "-":
+            os.remove(filename)
+        raise Cancelled()
+    return written